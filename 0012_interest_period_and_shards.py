@@ -0,0 +1,36 @@
+# Generated by Django 4.2.14 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0011_interestrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='interest_period',
+            field=models.CharField(blank=True, max_length=7),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('interest_period', ''), _negated=True), fields=('account', 'interest_period'), name='unique_interest_per_period'),
+        ),
+        migrations.AlterField(
+            model_name='interestrun',
+            name='period',
+            field=models.CharField(max_length=7),
+        ),
+        migrations.AddField(
+            model_name='interestrun',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='interestrun',
+            constraint=models.UniqueConstraint(fields=('period', 'shard'), name='unique_interest_run_shard'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.14 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('transactions', '0015_dailybalancesnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('item_count', models.PositiveIntegerField()),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Posted', 'Posted'), ('Failed', 'Failed')], default='Pending', max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('posted_at', models.DateTimeField(blank=True, null=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_batches', to='accounts.userbankaccount')),
+            ],
+        ),
+    ]
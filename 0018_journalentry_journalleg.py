@@ -0,0 +1,86 @@
+# Generated by Django 4.2.14 on 2026-10-18 13:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BALANCED_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION transactions_journal_balanced() RETURNS trigger AS $$
+DECLARE
+    checked_entry bigint;
+    total numeric;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        checked_entry := OLD.entry_id;
+    ELSE
+        checked_entry := NEW.entry_id;
+    END IF;
+    SELECT COALESCE(SUM(amount), 0) INTO total
+        FROM transactions_journalleg WHERE entry_id = checked_entry;
+    IF total <> 0 THEN
+        RAISE EXCEPTION 'Journal entry % is unbalanced by %', checked_entry, total;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE CONSTRAINT TRIGGER transactions_journal_balanced
+    AFTER INSERT OR UPDATE OR DELETE ON transactions_journalleg
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE PROCEDURE transactions_journal_balanced();
+"""
+
+DROP_BALANCED_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS transactions_journal_balanced ON transactions_journalleg;
+DROP FUNCTION IF EXISTS transactions_journal_balanced();
+"""
+
+
+def create_balanced_trigger(apps, schema_editor):
+    # Legs summing to zero spans rows, which a CHECK constraint cannot
+    # express; other databases rely on the posting services' check.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(BALANCED_TRIGGER_SQL)
+
+
+def drop_balanced_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_BALANCED_TRIGGER_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('transactions', '0017_notification_is_read_and_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.PositiveSmallIntegerField(choices=[(1, 'Deposit'), (2, 'Withdrawal'), (3, 'Interest'), (4, 'Payment'), (5, 'Transfer')])),
+                ('description', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JournalLeg',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='journal_legs', to='accounts.userbankaccount')),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='legs', to='transactions.journalentry')),
+                ('transaction', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='journal_leg', to='transactions.transaction')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'entry'], name='journal_leg_account_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='journalleg',
+            constraint=models.CheckConstraint(check=models.Q(('amount', 0), _negated=True), name='journal_leg_amount_nonzero'),
+        ),
+        migrations.RunPython(create_balanced_trigger, drop_balanced_trigger),
+    ]
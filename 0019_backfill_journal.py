@@ -0,0 +1,117 @@
+# Generated by Django 4.2.14 on 2026-10-18 13:45
+
+from django.db import migrations, transaction
+
+PAYMENT = 4
+TRANSFER = 5
+CHUNK_SIZE = 1000
+
+
+def backfill_journal(apps, schema_editor):
+    """Create journal entries for existing payment and transfer rows.
+
+    Every historical transfer has a row on the destination account naming
+    its source, and since the posting services were introduced payments
+    have a row on the payer's account naming the recipient; each such row
+    becomes a two-leg entry. Older payments only recorded the recipient
+    side, without the payer, and cannot be journaled.
+    """
+    Transaction = apps.get_model('transactions', 'Transaction')
+    JournalEntry = apps.get_model('transactions', 'JournalEntry')
+    JournalLeg = apps.get_model('transactions', 'JournalLeg')
+    UserBankAccount = apps.get_model('accounts', 'UserBankAccount')
+
+    db = schema_editor.connection.alias
+    can_bulk_return_pks = schema_editor.connection.features.can_return_rows_from_bulk_insert
+    # Keep the original posting time on backfilled entries.
+    JournalEntry._meta.get_field('created_at').auto_now_add = False
+
+    rows = (
+        Transaction.objects.using(db)
+        .filter(transaction_type__in=[PAYMENT, TRANSFER], journal_leg__isnull=True)
+        .exclude(amount=0)
+        .order_by('pk')
+        .values(
+            'pk', 'account_id', 'account__account_no', 'amount', 'timestamp',
+            'transaction_type', 'description', 'source_account', 'recipient_account',
+        )
+    )
+    last_pk = 0
+    while True:
+        chunk = list(rows.filter(pk__gt=last_pk)[:CHUNK_SIZE])
+        if not chunk:
+            break
+        last_pk = chunk[-1]['pk']
+
+        postings = []
+        for row in chunk:
+            own_account_no = str(row['account__account_no'])
+            if row['transaction_type'] == TRANSFER and row['source_account'] != own_account_no:
+                # Destination side: money came in from ``source_account``.
+                postings.append((row, row['source_account'], 1))
+            elif row['transaction_type'] == PAYMENT and row['recipient_account']:
+                # Payer side: money went out to ``recipient_account``.
+                postings.append((row, row['recipient_account'], -1))
+
+        counterparty_nos = {
+            account_no for _, account_no, _ in postings if account_no.isdigit()
+        }
+        counterparties = {
+            str(account_no): pk
+            for account_no, pk in UserBankAccount.objects.using(db)
+            .filter(account_no__in=counterparty_nos)
+            .values_list('account_no', 'pk')
+        }
+        postings = [
+            (row, counterparties[account_no], sign)
+            for row, account_no, sign in postings
+            if account_no in counterparties and counterparties[account_no] != row['account_id']
+        ]
+        if not postings:
+            continue
+
+        with transaction.atomic(using=db):
+            entries = [
+                JournalEntry(
+                    entry_type=row['transaction_type'],
+                    description=row['description'],
+                    created_at=row['timestamp'],
+                )
+                for row, _, _ in postings
+            ]
+            if can_bulk_return_pks:
+                entries = JournalEntry.objects.using(db).bulk_create(entries)
+            else:
+                for entry in entries:
+                    entry.save(using=db)
+
+            legs = []
+            for entry, (row, counterparty_pk, sign) in zip(entries, postings):
+                legs.append(JournalLeg(
+                    entry=entry,
+                    account_id=row['account_id'],
+                    amount=sign * row['amount'],
+                    transaction_id=row['pk'],
+                ))
+                legs.append(JournalLeg(
+                    entry=entry,
+                    account_id=counterparty_pk,
+                    amount=-sign * row['amount'],
+                ))
+            JournalLeg.objects.using(db).bulk_create(legs)
+
+
+class Migration(migrations.Migration):
+
+    # Each chunk commits on its own so the backfill never holds one huge
+    # transaction open.
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('transactions', '0018_journalentry_journalleg'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_journal, migrations.RunPython.noop),
+    ]
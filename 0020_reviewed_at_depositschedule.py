@@ -0,0 +1,42 @@
+# Generated by Django 4.2.14 on 2026-10-18 14:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0019_backfill_journal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fdapplication',
+            name='reviewed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rdapplication',
+            name='reviewed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='DepositSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('maturity_date', models.DateField()),
+                ('deposited_paise', models.BigIntegerField()),
+                ('interest_paise', models.BigIntegerField()),
+                ('maturity_paise', models.BigIntegerField()),
+                ('rows', models.JSONField()),
+                ('fd_application', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='schedule', to='transactions.fdapplication')),
+                ('rd_application', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='schedule', to='transactions.rdapplication')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='depositschedule',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('fd_application__isnull', False), ('rd_application__isnull', True)), models.Q(('fd_application__isnull', True), ('rd_application__isnull', False)), _connector='OR'), name='deposit_schedule_one_application'),
+        ),
+    ]
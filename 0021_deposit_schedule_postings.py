@@ -0,0 +1,42 @@
+# Generated by Django 4.2.14 on 2026-10-18 14:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0020_reviewed_at_depositschedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='depositschedule',
+            name='instalments_posted',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='depositschedule',
+            name='next_due_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='deposit_schedule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='postings', to='transactions.depositschedule'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='schedule_event',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='depositschedule',
+            index=models.Index(condition=models.Q(('next_due_date__isnull', False)), fields=['next_due_date', 'id'], name='deposit_schedule_due_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('deposit_schedule__isnull', False)), fields=('deposit_schedule', 'schedule_event'), name='unique_deposit_schedule_event'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.14 on 2026-10-18 14:55
+
+from django.db import migrations
+from django.db.models import F
+
+TASK_NAME = 'Post due FD/RD instalments and maturities'
+
+
+def schedule_postings(apps, schema_editor):
+    DepositSchedule = apps.get_model('transactions', 'DepositSchedule')
+    CrontabSchedule = apps.get_model('django_celery_beat', 'CrontabSchedule')
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+
+    # Existing schedules start with their first instalment.
+    DepositSchedule.objects.filter(
+        instalments_posted=0,
+        next_due_date__isnull=True
+    ).update(next_due_date=F('start_date'))
+
+    crontab, _ = CrontabSchedule.objects.get_or_create(
+        minute='30',
+        hour='0',
+        day_of_week='*',
+        day_of_month='*',
+        month_of_year='*',
+    )
+    PeriodicTask.objects.get_or_create(
+        name=TASK_NAME,
+        defaults={'task': 'post_due_deposits', 'crontab': crontab},
+    )
+
+
+def unschedule_postings(apps, schema_editor):
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTask.objects.filter(name=TASK_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_celery_beat', '__latest__'),
+        ('transactions', '0021_deposit_schedule_postings'),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_postings, unschedule_postings),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.14 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0022_schedule_deposit_postings'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['timestamp', 'id'], name='txn_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fdapplication',
+            index=models.Index(fields=['created_at', 'id'], name='fd_application_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rdapplication',
+            index=models.Index(fields=['created_at', 'id'], name='rd_application_created_idx'),
+        ),
+    ]
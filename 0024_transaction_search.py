@@ -0,0 +1,123 @@
+# Generated by Django 4.2.14 on 2026-10-18 16:10
+
+from django.db import migrations
+
+COUNTERPARTY_SQL = "(source_account || ' ' || destination_account || ' ' || recipient_account)"
+
+POSTGRESQL_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE EXTENSION IF NOT EXISTS btree_gin',
+    f"""
+    ALTER TABLE transactions_transaction ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(description, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(recipient_name, '')), 'B')
+            || setweight(to_tsvector('simple', {COUNTERPARTY_SQL}), 'C')
+        ) STORED
+    """,
+    # Leading account_id (via btree_gin) scopes each search to one ledger.
+    """
+    CREATE INDEX txn_search_vector_idx ON transactions_transaction
+        USING GIN (account_id, search_vector)
+    """,
+    f"""
+    CREATE INDEX txn_counterparty_trgm_idx ON transactions_transaction
+        USING GIN (account_id, {COUNTERPARTY_SQL} gin_trgm_ops)
+    """,
+]
+
+DROP_POSTGRESQL_SQL = [
+    'DROP INDEX IF EXISTS txn_counterparty_trgm_idx',
+    'DROP INDEX IF EXISTS txn_search_vector_idx',
+    'ALTER TABLE transactions_transaction DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_SQL = [
+    """
+    CREATE VIRTUAL TABLE transactions_transaction_fts USING fts5(
+        description, recipient_name, counterparty, tokenize = '{tokenizer}'
+    )
+    """,
+    f"""
+    INSERT INTO transactions_transaction_fts(rowid, description, recipient_name, counterparty)
+        SELECT id, description, recipient_name, {COUNTERPARTY_SQL}
+        FROM transactions_transaction
+    """,
+    # Trigger bodies spell out COUNTERPARTY_SQL over the ``new`` row.
+    """
+    CREATE TRIGGER transactions_transaction_fts_insert
+        AFTER INSERT ON transactions_transaction
+    BEGIN
+        INSERT INTO transactions_transaction_fts(rowid, description, recipient_name, counterparty)
+            VALUES (new.id, new.description, new.recipient_name,
+                    new.source_account || ' ' || new.destination_account || ' ' || new.recipient_account);
+    END
+    """,
+    """
+    CREATE TRIGGER transactions_transaction_fts_delete
+        AFTER DELETE ON transactions_transaction
+    BEGIN
+        DELETE FROM transactions_transaction_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER transactions_transaction_fts_update
+        AFTER UPDATE OF description, recipient_name, source_account,
+                        destination_account, recipient_account
+        ON transactions_transaction
+    BEGIN
+        UPDATE transactions_transaction_fts
+            SET description = new.description,
+                recipient_name = new.recipient_name,
+                counterparty = new.source_account || ' ' || new.destination_account
+                               || ' ' || new.recipient_account
+            WHERE rowid = old.id;
+    END
+    """,
+]
+
+DROP_SQLITE_SQL = [
+    'DROP TRIGGER IF EXISTS transactions_transaction_fts_update',
+    'DROP TRIGGER IF EXISTS transactions_transaction_fts_delete',
+    'DROP TRIGGER IF EXISTS transactions_transaction_fts_insert',
+    'DROP TABLE IF EXISTS transactions_transaction_fts',
+]
+
+
+def create_search_index(apps, schema_editor):
+    """Full-text search on PostgreSQL, an FTS5 stand-in on SQLite for local
+    development; other databases search without an index.
+
+    On SQLite the triggers live on the transaction table, which Django
+    rebuilds to alter a column, so any later migration altering
+    ``Transaction`` must recreate them.
+    """
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        statements = POSTGRESQL_SQL
+    elif connection.vendor == 'sqlite':
+        # The trigram tokenizer (substring matching) needs SQLite 3.34.
+        tokenizer = 'trigram' if connection.Database.sqlite_version_info >= (3, 34) else 'unicode61'
+        statements = [SQLITE_SQL[0].format(tokenizer=tokenizer), *SQLITE_SQL[1:]]
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': DROP_POSTGRESQL_SQL, 'sqlite': DROP_SQLITE_SQL}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0023_admin_changelist_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.14 on 2026-10-18 17:05
+
+from django.db import migrations
+
+TASK_NAME = 'Purge expired idempotency keys'
+
+
+def schedule_purge(apps, schema_editor):
+    CrontabSchedule = apps.get_model('django_celery_beat', 'CrontabSchedule')
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+
+    crontab, _ = CrontabSchedule.objects.get_or_create(
+        minute='15',
+        hour='*',
+        day_of_week='*',
+        day_of_month='*',
+        month_of_year='*',
+    )
+    PeriodicTask.objects.get_or_create(
+        name=TASK_NAME,
+        defaults={'task': 'purge_idempotency_keys', 'crontab': crontab},
+    )
+
+
+def unschedule_purge(apps, schema_editor):
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTask.objects.filter(name=TASK_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_celery_beat', '__latest__'),
+        ('transactions', '0025_idempotencykey_request_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_purge, unschedule_purge),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.14 on 2026-10-18 17:40
+
+from dateutil.relativedelta import relativedelta
+from django.db import migrations
+from django.utils import timezone
+
+CHUNK_SIZE = 1000
+
+
+def skip_past_events(apps, schema_editor):
+    """Move schedules that have never posted past the events dated before
+    today.
+
+    Migration 0022 started every existing schedule at its start date, so the
+    first daily run would have debited every past instalment of an older
+    deposit at once. Those deposits were settled before postings were
+    automated; their schedules now start with the next future event, as
+    ``schedules.first_due`` does for new ones.
+    """
+    DepositSchedule = apps.get_model('transactions', 'DepositSchedule')
+    db = schema_editor.connection.alias
+    today = timezone.localdate()
+
+    schedules = (
+        DepositSchedule.objects.using(db)
+        .filter(instalments_posted=0, next_due_date__lt=today, postings__isnull=True)
+        .order_by('pk')
+    )
+    last_pk = 0
+    while True:
+        chunk = list(schedules.filter(pk__gt=last_pk)[:CHUNK_SIZE])
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+
+        for schedule in chunk:
+            instalment_count = 1 if schedule.fd_application_id else len(schedule.rows)
+            posted = 0
+            while (
+                posted < instalment_count
+                and schedule.start_date + relativedelta(months=posted) < today
+            ):
+                posted += 1
+            schedule.instalments_posted = posted
+            if posted < instalment_count:
+                schedule.next_due_date = schedule.start_date + relativedelta(months=posted)
+            elif schedule.maturity_date >= today:
+                schedule.next_due_date = schedule.maturity_date
+            else:
+                schedule.next_due_date = None
+        DepositSchedule.objects.using(db).bulk_update(
+            chunk, ['instalments_posted', 'next_due_date']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0026_schedule_idempotency_key_purge'),
+    ]
+
+    operations = [
+        migrations.RunPython(skip_past_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.14 on 2026-10-18 18:30
+
+from django.db import migrations
+
+TASK_NAME = 'Backfill daily balance snapshots'
+
+
+def schedule_snapshots(apps, schema_editor):
+    CrontabSchedule = apps.get_model('django_celery_beat', 'CrontabSchedule')
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+
+    # Shortly after midnight, once the previous day is complete.
+    crontab, _ = CrontabSchedule.objects.get_or_create(
+        minute='10',
+        hour='0',
+        day_of_week='*',
+        day_of_month='*',
+        month_of_year='*',
+    )
+    PeriodicTask.objects.get_or_create(
+        name=TASK_NAME,
+        defaults={'task': 'snapshot_daily_balances', 'crontab': crontab},
+    )
+
+
+def unschedule_snapshots(apps, schema_editor):
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTask.objects.filter(name=TASK_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_celery_beat', '__latest__'),
+        ('transactions', '0027_deposit_schedule_first_due'),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_snapshots, unschedule_snapshots),
+    ]
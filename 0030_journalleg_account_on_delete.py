@@ -0,0 +1,20 @@
+# Generated by Django 4.2.14 on 2026-10-18 19:10
+
+from django.db import migrations, models
+import transactions.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('transactions', '0029_idempotencykey_batch'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='journalleg',
+            name='account',
+            field=models.ForeignKey(on_delete=transactions.models.delete_journal_entries, related_name='journal_legs', to='accounts.userbankaccount'),
+        ),
+    ]
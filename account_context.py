@@ -0,0 +1,79 @@
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import BankAccountType, UserBankAccount
+
+ACCOUNT_TYPES_VERSION_KEY = 'account_types:version'
+
+AccountTypeLimits = namedtuple('AccountTypeLimits', [
+    'maximum_withdrawal_amount',
+    'annual_interest_rate',
+    'interest_calculation_per_year',
+])
+
+# Process-wide copy of every account type's limits, tagged with the shared
+# version it was loaded under.
+_account_types = {'version': None, 'limits': {}}
+
+
+def get_account(request):
+    """The signed-in user's bank account, loaded once per request.
+
+    The instance is also assigned to ``request.user.account`` so code that
+    still walks the relation reuses it instead of querying again.
+    """
+    account = getattr(request, '_bank_account', None)
+    if account is None:
+        account = UserBankAccount.objects.get(user=request.user)
+        request.user.account = account
+        request._bank_account = account
+    return account
+
+
+def account_type_limits(account_type_id):
+    """Limits of an account type from the process-wide cache.
+
+    Account types change rarely, so all of them are loaded together and kept
+    until the shared version in the cache is bumped by a change to any of
+    them; a lookup then costs a single cache read.
+    """
+    version = cache.get_or_set(
+        ACCOUNT_TYPES_VERSION_KEY, lambda: int(time.time() * 1000), None
+    )
+    account_types = _account_types
+    if account_types['version'] != version or account_type_id not in account_types['limits']:
+        account_types = {
+            'version': version,
+            'limits': {
+                pk: AccountTypeLimits(*limits)
+                for pk, *limits in BankAccountType.objects.values_list(
+                    'pk',
+                    'maximum_withdrawal_amount',
+                    'annual_interest_rate',
+                    'interest_calculation_per_year',
+                )
+            },
+        }
+        _account_types.update(account_types)
+    return account_types['limits'][account_type_id]
+
+
+@receiver(post_save, sender=BankAccountType)
+@receiver(post_delete, sender=BankAccountType)
+def bump_account_types_version(**kwargs):
+    # Bumped after commit, so no process reloads the limits from data that
+    # has not committed yet and keeps them under the new version.
+    def bump():
+        try:
+            cache.incr(ACCOUNT_TYPES_VERSION_KEY)
+        except ValueError:
+            # Like the ledger versions, restart from the time so a version
+            # handed out before the cache lost the counter is never reused.
+            cache.set(ACCOUNT_TYPES_VERSION_KEY, int(time.time() * 1000), None)
+
+    transaction.on_commit(bump)
@@ -1,53 +1,132 @@
 from django.contrib import admin
+from django.contrib.auth import get_user_model
+
+from accounts.models import UserBankAccount
 from .models import FDApplication, Notification, RDApplication
-from django.core.mail import send_mail
 from transactions.models import Transaction
+from transactions.pagination import EstimatedCountPaginator
+from transactions.tasks import review_applications
+
+# Cap on the users a search term may expand to.
+SEARCH_MATCH_LIMIT = 1000
+
+
+class PrefixSearchMixin:
+    """Search by username prefix or exact account number.
+
+    The default admin search runs ``icontains`` over every ``search_fields``
+    entry, which no index can answer. Here the term is first resolved to a
+    short list of users through the username index (case-sensitive
+    ``startswith`` is a ``LIKE 'term%'`` the ``_like`` index serves) and the
+    account number index, and the changelist is filtered on those ids.
+    """
+    search_fields = ('user__username',)
+    search_help_text = 'Username prefix, or an exact account number.'
+
+    def matching_user_ids(self, term):
+        user_ids = set(
+            get_user_model().objects
+            .filter(username__startswith=term)
+            .values_list('pk', flat=True)[:SEARCH_MATCH_LIMIT]
+        )
+        if term.isdigit():
+            user_ids.update(
+                UserBankAccount.objects
+                .filter(account_no=int(term))
+                .values_list('user_id', flat=True)
+            )
+        return user_ids
+
+    def filter_by_users(self, queryset, user_ids):
+        return queryset.filter(user_id__in=user_ids)
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        return self.filter_by_users(queryset, self.matching_user_ids(term)), False
+
+
+class TransactionAdmin(PrefixSearchMixin, admin.ModelAdmin):
+    list_display = ('id', 'account', 'transaction_type', 'amount', 'balance_after_transaction', 'timestamp')
+    list_filter = ('transaction_type',)
+    list_select_related = ('account__user',)
+    raw_id_fields = ('account', 'deposit_schedule')
+    date_hierarchy = 'timestamp'
+    ordering = ('-timestamp', '-id')
+    search_fields = ('account__user__username',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def filter_by_users(self, queryset, user_ids):
+        # Filter on account ids so the (account, timestamp, id) index is used.
+        account_ids = UserBankAccount.objects.filter(
+            user_id__in=user_ids
+        ).values_list('pk', flat=True)
+        return queryset.filter(account_id__in=list(account_ids))
+
 
-admin.site.register(Transaction)
+admin.site.register(Transaction, TransactionAdmin)
 # admin.site.register(Payment)
 # admin.site.register(Transfer)
 
 
-class FDApplicationAdmin(admin.ModelAdmin):
+class FDApplicationAdmin(PrefixSearchMixin, admin.ModelAdmin):
     list_display = ('user', 'amount', 'tenure', 'interest_rate', 'status', 'created_at')
     list_filter = ('status', 'created_at')
-    search_fields = ('user__username', 'amount')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    ordering = ('-created_at', '-id')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     actions = ['approve_selected', 'reject_selected']
 
     def approve_selected(self, request, queryset):
-        rows_updated = queryset.update(status='Approved')
-        self.message_user(request, f"{rows_updated} FD applications were approved.")
+        application_ids = list(queryset.values_list('pk', flat=True))
+        review_applications.delay('fd', application_ids, 'Approved')
+        self.message_user(request, f"{len(application_ids)} FD applications were queued to be approved.")
     approve_selected.short_description = "Approve selected FD applications"
 
     def reject_selected(self, request, queryset):
-        rows_updated = queryset.update(status='Rejected')
-        self.message_user(request, f"{rows_updated} FD applications were rejected.")
+        application_ids = list(queryset.values_list('pk', flat=True))
+        review_applications.delay('fd', application_ids, 'Rejected')
+        self.message_user(request, f"{len(application_ids)} FD applications were queued to be rejected.")
     reject_selected.short_description = "Reject selected FD applications"
 
-class RDApplicationAdmin(admin.ModelAdmin):
+class RDApplicationAdmin(PrefixSearchMixin, admin.ModelAdmin):
     list_display = ('user', 'amount', 'monthly_amount', 'tenure', 'interest_rate', 'status', 'created_at')
     list_filter = ('status', 'created_at')
-    search_fields = ('user__username', 'amount')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    ordering = ('-created_at', '-id')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     actions = ['approve_selected', 'reject_selected']
 
     def approve_selected(self, request, queryset):
-        rows_updated = queryset.update(status='Approved')
-        self.message_user(request, f"{rows_updated} RD applications were approved.")
+        application_ids = list(queryset.values_list('pk', flat=True))
+        review_applications.delay('rd', application_ids, 'Approved')
+        self.message_user(request, f"{len(application_ids)} RD applications were queued to be approved.")
     approve_selected.short_description = "Approve selected RD applications"
 
     def reject_selected(self, request, queryset):
-        rows_updated = queryset.update(status='Rejected')
-        self.message_user(request, f"{rows_updated} RD applications were rejected.")
+        application_ids = list(queryset.values_list('pk', flat=True))
+        review_applications.delay('rd', application_ids, 'Rejected')
+        self.message_user(request, f"{len(application_ids)} RD applications were queued to be rejected.")
     reject_selected.short_description = "Reject selected RD applications"
 
 # admin.py
 from django.contrib import admin
 from .models import Notification
 
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(PrefixSearchMixin, admin.ModelAdmin):
     list_display = ('user', 'message', 'created_at')
-    search_fields = ('user__username', 'message')
-    list_filter = ('created_at',)
+    list_filter = ('is_read', 'created_at')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 admin.site.register(Notification, NotificationAdmin)
 
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class TransactionsConfig(AppConfig):
     name = 'transactions'
+
+    def ready(self):
+        # Connect the account-type cache invalidation receivers.
+        from . import account_context  # noqa: F401
+        # Connect the Celery task profiling receivers.
+        from . import profiling  # noqa: F401
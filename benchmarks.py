@@ -0,0 +1,300 @@
+import contextlib
+import datetime
+import random
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Max, Sum
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import UserBankAccount
+from transactions.constants import DEPOSIT, INTEREST, PAYMENT, TRANSFER, WITHDRAWAL
+from transactions.models import Transaction
+
+SEED_BATCH_SIZE = 10000
+BENCH_USERNAME_PREFIX = 'bench-'
+WORKLOAD_MIX = {
+    'deposit': 3,
+    'withdraw': 2,
+    'transfer': 2,
+    'payment': 2,
+    'report': 1,
+}
+
+
+@contextlib.contextmanager
+def explicit_timestamps():
+    """Let ``bulk_create`` keep the ``timestamp`` set on seeded rows instead
+    of stamping every row with ``auto_now_add``."""
+    field = Transaction._meta.get_field('timestamp')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def seed_ledger(accounts, rows, days=3 * 365, batch_size=SEED_BATCH_SIZE, seed=None):
+    """Write ``rows`` random ledger rows spread over ``accounts`` and the
+    last ``days`` days. Returns the number of rows written.
+
+    The accounts must be benchmark accounts with no ledger yet. Each
+    account's rows are generated in time order with running balances, and
+    its balance is set to the last of them, so the seeded ledgers pass the
+    integrity check. Transfers and payments name other seeded accounts as
+    counterparties, but only the sending side is written.
+    """
+    if not accounts:
+        return 0
+    rng = random.Random(seed)
+    account_nos = [str(account.account_no) for account in accounts]
+    now = timezone.now()
+    written = 0
+    batch = []
+    updated = []
+
+    with explicit_timestamps():
+        for index, account in enumerate(accounts):
+            count = rows // len(accounts) + (1 if index < rows % len(accounts) else 0)
+            moments = sorted(
+                now - datetime.timedelta(seconds=rng.randint(0, days * 86400))
+                for _ in range(count)
+            )
+            for timestamp in moments:
+                amount = Decimal(rng.randint(100, 5000000)) / 100
+                transaction_type = rng.choice(
+                    (DEPOSIT, WITHDRAWAL, INTEREST, PAYMENT, TRANSFER)
+                )
+                row = Transaction(
+                    account=account,
+                    amount=amount,
+                    transaction_type=transaction_type,
+                    timestamp=timestamp,
+                )
+                if transaction_type in (WITHDRAWAL, PAYMENT, TRANSFER) and amount > account.balance:
+                    row.transaction_type = transaction_type = DEPOSIT
+                if transaction_type == TRANSFER:
+                    row.source_account = str(account.account_no)
+                    row.destination_account = rng.choice(account_nos)
+                elif transaction_type == PAYMENT:
+                    row.recipient_account = rng.choice(account_nos)
+                if transaction_type in (DEPOSIT, INTEREST):
+                    account.balance += amount
+                else:
+                    account.balance -= amount
+                row.balance_after_transaction = account.balance
+                batch.append(row)
+            updated.append(account)
+
+            if len(batch) >= batch_size or index == len(accounts) - 1:
+                Transaction.objects.bulk_create(batch, batch_size=batch_size)
+                UserBankAccount.objects.bulk_update(updated, ['balance'], batch_size=batch_size)
+                written += len(batch)
+                batch = []
+                updated = []
+
+    return written
+
+
+def seed_accounts(count, account_type, rows_per_account=20, days=365, seed=None):
+    """Create ``count`` benchmark users with bank accounts of
+    ``account_type``, each with a ledger of ``rows_per_account`` deposits,
+    withdrawals and interest credits whose running balances agree with the
+    account balance. Returns the new accounts.
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+    password = make_password(BENCH_USERNAME_PREFIX)
+    first_no = (UserBankAccount.objects.aggregate(last=Max('account_no'))['last'] or 0) + 1
+    now = timezone.now()
+
+    users = []
+    for account_no in range(first_no, first_no + count):
+        identifier = f'{BENCH_USERNAME_PREFIX}{account_no}@example.com'
+        user = User(password=password, email=identifier, first_name='Bench')
+        setattr(user, User.USERNAME_FIELD, identifier)
+        users.append(user)
+    users = User.objects.bulk_create(users, batch_size=SEED_BATCH_SIZE)
+
+    accounts = []
+    ledger = []
+    for account_no, user in enumerate(users, start=first_no):
+        account = UserBankAccount(
+            user=user,
+            account_type=account_type,
+            account_no=account_no,
+            balance=Decimal('0.00'),
+            initial_deposit_date=now - datetime.timedelta(days=days),
+        )
+        moments = sorted(
+            now - datetime.timedelta(seconds=rng.randint(0, days * 86400))
+            for _ in range(rows_per_account)
+        )
+        for index, timestamp in enumerate(moments):
+            amount = Decimal(rng.randint(10000, 5000000)) / 100
+            if index == 0 or rng.random() < 0.5:
+                transaction_type = DEPOSIT
+            elif amount <= account.balance and rng.random() < 0.8:
+                transaction_type = WITHDRAWAL
+            else:
+                transaction_type = INTEREST
+                amount = (account.balance * Decimal('0.005')).quantize(Decimal('0.01'))
+                if not amount:
+                    continue
+            account.balance += -amount if transaction_type == WITHDRAWAL else amount
+            ledger.append(Transaction(
+                account=account,
+                amount=amount,
+                balance_after_transaction=account.balance,
+                transaction_type=transaction_type,
+                timestamp=timestamp,
+            ))
+        accounts.append(account)
+
+    accounts = UserBankAccount.objects.bulk_create(accounts, batch_size=SEED_BATCH_SIZE)
+    with explicit_timestamps():
+        Transaction.objects.bulk_create(ledger, batch_size=SEED_BATCH_SIZE)
+    return accounts
+
+
+def bench_accounts():
+    return UserBankAccount.objects.filter(
+        **{f'user__{get_user_model().USERNAME_FIELD}__startswith': BENCH_USERNAME_PREFIX}
+    ).select_related('user').order_by('pk')
+
+
+def total_balance(accounts):
+    return UserBankAccount.objects.filter(
+        pk__in=[account.pk for account in accounts]
+    ).aggregate(total=Sum('balance'))['total'] or Decimal('0.00')
+
+
+def build_request(name, account, counterparty, rng):
+    """``(method, url, data, balance_change)`` of one scripted request;
+    ``balance_change`` is what a successful request adds to the total
+    balance of the benchmark accounts."""
+    if name == 'report':
+        return 'get', reverse('transactions:transaction_report'), {}, Decimal('0.00')
+
+    cents = Decimal(rng.randint(0, 10000)) / 100
+    if name == 'deposit':
+        amount = settings.MINIMUM_DEPOSIT_AMOUNT + cents
+        return 'post', reverse('transactions:deposit_money'), {'amount': amount}, amount
+    if name == 'withdraw':
+        amount = settings.MINIMUM_WITHDRAWAL_AMOUNT + cents
+        return 'post', reverse('transactions:withdraw_money'), {'amount': amount}, -amount
+    if name == 'transfer':
+        amount = settings.MINIMUM_TRANSFER_AMOUNT + cents
+        return 'post', reverse('transactions:transfer_form'), {
+            'amount': amount,
+            'source_account': str(account.account_no),
+            'destination_account': str(counterparty.account_no),
+            'description': 'Benchmark transfer',
+        }, Decimal('0.00')
+    if name == 'payment':
+        amount = settings.MINIMUM_WITHDRAWAL_AMOUNT + cents
+        return 'post', reverse('transactions:payment_form'), {
+            'amount': amount,
+            'recipient_name': 'Benchmark',
+            'recipient_account': str(counterparty.account_no),
+            'payment_method': 'bank_account',
+            'description': 'Benchmark payment',
+        }, Decimal('0.00')
+    raise ValueError(f'Unknown workload {name!r}')
+
+
+def run_workload(accounts, requests, concurrency, mix=WORKLOAD_MIX, seed=None):
+    """Send ``requests`` scripted requests from ``concurrency`` threads,
+    each logged in as a random benchmark user through Django's test client.
+
+    Returns ``(elapsed, samples, balance_change)`` where ``samples`` maps a
+    workload name to ``(latency_ms, query_count, outcome)`` tuples and
+    ``outcome`` is ``'ok'``, ``'rejected'`` (form errors) or ``'error'``.
+    """
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = defaultdict(list)
+    balance_change = [Decimal('0.00')]
+    lock = threading.Lock()
+
+    def worker(index, count):
+        rng = random.Random(None if seed is None else seed + index)
+        clients = {}
+        connection = connections[DEFAULT_DB_ALIAS]
+        try:
+            for _ in range(count):
+                name = rng.choices(names, weights)[0]
+                account, counterparty = rng.sample(accounts, 2)
+                method, url, data, change = build_request(name, account, counterparty, rng)
+
+                client = clients.get(account.pk)
+                if client is None:
+                    client = clients[account.pk] = Client()
+                    client.force_login(account.user)
+
+                started = time.perf_counter()
+                try:
+                    with CaptureQueriesContext(connection) as queries:
+                        response = getattr(client, method)(url, data)
+                except Exception:
+                    outcome, query_count = 'error', 0
+                else:
+                    query_count = len(queries)
+                    if response.status_code >= 400:
+                        outcome = 'error'
+                    elif method == 'post' and response.status_code == 200:
+                        outcome = 'rejected'
+                    else:
+                        outcome = 'ok'
+                latency = (time.perf_counter() - started) * 1000
+
+                with lock:
+                    samples[name].append((latency, query_count, outcome))
+                    if outcome == 'ok':
+                        balance_change[0] += change
+        finally:
+            connection.close()
+
+    counts = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(i, count)) for i, count in enumerate(counts)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, dict(samples), balance_change[0]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def time_calls(func, iterations):
+    """Call ``func`` ``iterations`` times and return latency stats in ms."""
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    return latency_stats(samples)
+
+
+def latency_stats(samples):
+    return {
+        'p50': percentile(samples, 0.50),
+        'p95': percentile(samples, 0.95),
+        'p99': percentile(samples, 0.99),
+        'mean': sum(samples) / len(samples),
+    }
@@ -0,0 +1,17 @@
+from django.utils.functional import SimpleLazyObject
+
+from transactions.notifications import unread_count
+
+
+def notifications(request):
+    """Expose ``unread_notifications`` to templates for header badges.
+
+    Add ``transactions.context_processors.notifications`` to the template
+    ``context_processors`` setting. The count is lazy and cached, so pages
+    that don't show it cost nothing and those that do cost one cache hit.
+    """
+    if not request.user.is_authenticated:
+        return {}
+    return {
+        'unread_notifications': SimpleLazyObject(lambda: unread_count(request.user)),
+    }
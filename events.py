@@ -0,0 +1,60 @@
+import json
+import logging
+
+import redis
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+EVENTS_REDIS_URL = getattr(
+    settings,
+    'EVENTS_REDIS_URL',
+    getattr(settings, 'CELERY_BROKER_URL', 'redis://localhost:6379/0')
+)
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(EVENTS_REDIS_URL)
+    return _client
+
+
+def user_channel(user_id):
+    return f'events:user:{user_id}'
+
+
+def publish(user_id, event, data):
+    """Publish ``event`` to ``user_id``'s event stream once the current
+    database transaction commits.
+
+    Delivery is best effort: a Redis outage is logged and never fails the
+    posting that triggered it.
+    """
+    message = json.dumps({'event': event, 'data': data})
+
+    def send():
+        try:
+            get_client().publish(user_channel(user_id), message)
+        except redis.RedisError:
+            logger.warning('Could not publish %s event for user %s', event, user_id)
+
+    transaction.on_commit(send)
+
+
+def publish_balance(account):
+    publish(account.user_id, 'balance', {
+        'account': str(account.account_no),
+        'balance': str(account.balance),
+    })
+
+
+def publish_notification(notification):
+    publish(notification.user_id, 'notification', {
+        'id': notification.pk,
+        'message': notification.message,
+        'created_at': notification.created_at.isoformat(),
+    })
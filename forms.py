@@ -1,12 +1,18 @@
-import datetime
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
 
 from django import forms
 from django.conf import settings
+from django.utils import timezone
 
 from .models import Transaction, FDApplication, RDApplication
 
 from django import forms
-from accounts.models import UserBankAccount  # Corrected import
+from .account_context import account_type_limits
+from .reports import DATERANGE_PRESETS, daterange_bounds, parse_daterange, preset_dates
+from .resolver import account_stub, resolve_account, resolve_accounts
 from django.core.exceptions import ValidationError
 
 from django import forms
@@ -20,6 +26,13 @@ from accounts.models import User
 #         fields = ['account_type', 'gender', 'birth_date', 'image', 'info', 'social', 'connection', 'notification']
 
 class TransactionForm(forms.ModelForm):
+    # Generated per rendered form so a resubmitted POST can be recognised;
+    # API clients may send an ``Idempotency-Key`` header instead.
+    idempotency_key = forms.CharField(
+        required=False,
+        max_length=64,
+        widget=forms.HiddenInput()
+    )
 
     class Meta:
         model = Transaction
@@ -69,9 +82,9 @@ class WithdrawForm(TransactionForm):
     def clean_amount(self):
         account = self.account
         min_withdraw_amount = settings.MINIMUM_WITHDRAWAL_AMOUNT
-        max_withdraw_amount = (
-            account.account_type.maximum_withdrawal_amount
-        )
+        max_withdraw_amount = account_type_limits(
+            account.account_type_id
+        ).maximum_withdrawal_amount
         balance = account.balance
 
         amount = self.cleaned_data.get('amount')
@@ -96,24 +109,48 @@ class WithdrawForm(TransactionForm):
 
 
 class TransactionDateRangeForm(forms.Form):
+    """A preset or a ``"YYYY-MM-DD - YYYY-MM-DD"`` range, either end of
+    which may be left open.
+
+    ``cleaned_data`` carries the inclusive ``start_date`` and ``end_date``
+    and the timezone-aware half-open ``start`` and ``end`` bounds to filter
+    ``timestamp >= start AND timestamp < end`` on; open ends are ``None``.
+    """
+    preset = forms.ChoiceField(
+        choices=[('', 'Custom range'), *DATERANGE_PRESETS],
+        required=False
+    )
     daterange = forms.CharField(required=False)
 
     def clean_daterange(self):
-        daterange = self.cleaned_data.get("daterange")
-        print(daterange)
+        daterange = self.cleaned_data.get("daterange", "").strip()
+        if not daterange:
+            return None, None
 
         try:
-            daterange = daterange.split(' - ')
-            print(daterange)
-            if len(daterange) == 2:
-                for date in daterange:
-                    datetime.datetime.strptime(date, '%Y-%m-%d')
-                return daterange
-            else:
-                raise forms.ValidationError("Please select a date range.")
-        except (ValueError, AttributeError):
+            return parse_daterange(daterange)
+        except ValueError:
             raise forms.ValidationError("Invalid date range")
 
+    def clean(self):
+        cleaned_data = super().clean()
+        if 'daterange' not in cleaned_data or 'preset' not in cleaned_data:
+            return cleaned_data
+
+        if cleaned_data['preset']:
+            start_date, end_date = preset_dates(cleaned_data['preset'], timezone.localdate())
+        else:
+            start_date, end_date = cleaned_data['daterange']
+
+        if start_date and end_date and start_date > end_date:
+            self.add_error('daterange', 'The start date must not be after the end date.')
+            return cleaned_data
+
+        cleaned_data['start_date'] = start_date
+        cleaned_data['end_date'] = end_date
+        cleaned_data['start'], cleaned_data['end'] = daterange_bounds(start_date, end_date)
+        return cleaned_data
+
 
 
 
@@ -179,7 +216,7 @@ class PaymentForm(TransactionForm):
     def clean_amount(self):
         account = self.account
         min_withdraw_amount = settings.MINIMUM_WITHDRAWAL_AMOUNT
-        max_withdraw_amount = account.account_type.maximum_withdrawal_amount
+        max_withdraw_amount = account_type_limits(account.account_type_id).maximum_withdrawal_amount
         balance = account.balance
 
         amount = self.cleaned_data.get('amount')
@@ -210,9 +247,12 @@ class PaymentForm(TransactionForm):
         if recipient_account_no == user_account:
             raise ValidationError('You cannot make a payment to your own account.')
 
-        
-        if not UserBankAccount.objects.filter(account_no=recipient_account_no).exists():
+        # Resolved once here and reused by the view to post the payment.
+        self.recipient = resolve_account(recipient_account_no)
+        if self.recipient is None:
             raise forms.ValidationError('The recipient account number does not exist.')
+        if not self.recipient.is_active:
+            raise forms.ValidationError('The recipient account is not active.')
 
         return recipient_account_no
 
@@ -238,7 +278,7 @@ class TransferForm(TransactionForm):
     def clean_amount(self):
         account = self.account
         min_transfer_amount = settings.MINIMUM_TRANSFER_AMOUNT
-        max_transfer_amount = account.account_type.maximum_withdrawal_amount
+        max_transfer_amount = account_type_limits(account.account_type_id).maximum_withdrawal_amount
         balance = account.balance
 
         amount = self.cleaned_data.get('amount')
@@ -270,18 +310,16 @@ class TransferForm(TransactionForm):
         if source_account_number == destination_account_number:
             raise ValidationError('Source and destination accounts cannot be the same.')
 
-        try:
-            source_account = UserBankAccount.objects.get(account_no=source_account_number)
-        except UserBankAccount.DoesNotExist:
-            raise ValidationError('Source account does not exist.')
-
-        if source_account != self.account:
+        # The source must be the requesting account, which is already loaded.
+        if source_account_number != str(self.account.account_no):
             raise ValidationError('Source account must be your own account.')
 
-        try:
-            destination_account = UserBankAccount.objects.get(account_no=destination_account_number)
-        except UserBankAccount.DoesNotExist:
+        # Resolved once here and reused by the view to post the transfer.
+        self.destination = resolve_account(destination_account_number)
+        if self.destination is None:
             raise ValidationError('Destination account does not exist.')
+        if not self.destination.is_active:
+            raise ValidationError('Destination account is not active.')
 
         return cleaned_data
 
@@ -290,6 +328,125 @@ class TransferForm(TransactionForm):
         return super().save(commit=commit)
 
 
+class BatchPaymentForm(forms.Form):
+    """Uploaded CSV or pasted JSON list of payments.
+
+    Both formats carry ``destination_account``, ``amount`` and an optional
+    ``description`` per payment; the CSV needs a header row naming them.
+    """
+    file = forms.FileField(
+        required=False,
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control'})
+    )
+    payments = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={'class': 'form-control'})
+    )
+    description = forms.CharField(
+        required=False,
+        max_length=255,
+        widget=forms.TextInput(attrs={'class': 'form-control'})
+    )
+    # See ``TransactionForm.idempotency_key``.
+    idempotency_key = forms.CharField(
+        required=False,
+        max_length=64,
+        widget=forms.HiddenInput()
+    )
+
+    def __init__(self, *args, **kwargs):
+        self.account = kwargs.pop('account')
+        super().__init__(*args, **kwargs)
+
+    def read_rows(self):
+        upload = self.cleaned_data.get('file')
+        if upload:
+            try:
+                text = upload.read().decode('utf-8-sig')
+            except UnicodeDecodeError:
+                raise ValidationError('The uploaded file must be UTF-8 encoded CSV.')
+            return list(csv.DictReader(io.StringIO(text)))
+
+        payments = self.cleaned_data.get('payments')
+        if payments:
+            try:
+                rows = json.loads(payments)
+            except ValueError:
+                raise ValidationError('Payments must be a JSON list.')
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                raise ValidationError('Payments must be a JSON list of objects.')
+            return rows
+
+        raise ValidationError('Upload a CSV file or enter the payments as JSON.')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        rows = self.read_rows()
+        max_items = getattr(settings, 'BATCH_PAYMENT_MAX_ITEMS', 1000)
+        if not rows:
+            raise ValidationError('The batch has no payments.')
+        if len(rows) > max_items:
+            raise ValidationError(f'A batch can have at most {max_items} payments.')
+
+        min_transfer_amount = settings.MINIMUM_TRANSFER_AMOUNT
+        max_digits = Transaction._meta.get_field('amount').max_digits
+        payments = []
+        for line, row in enumerate(rows, start=1):
+            account_no = str(row.get('destination_account') or '').strip()
+            try:
+                amount = Decimal(str(row.get('amount')))
+                if not amount.is_finite():
+                    raise ValueError
+                amount = amount.quantize(Decimal('0.01'))
+            except (InvalidOperation, ValueError):
+                raise ValidationError(f'Payment {line}: invalid amount.')
+            if len(amount.as_tuple().digits) > max_digits:
+                raise ValidationError(f'Payment {line}: amount is too large.')
+            if not account_no:
+                raise ValidationError(f'Payment {line}: destination account is required.')
+            if amount < min_transfer_amount:
+                raise ValidationError(
+                    f'Payment {line}: you must transfer at least {min_transfer_amount} Rupees'
+                )
+            payments.append((account_no, amount, str(row.get('description') or '')))
+
+        # Resolve every destination at once: cached, or one account_no__in query.
+        destinations = resolve_accounts(
+            account_no for account_no, _, _ in payments
+        )
+        missing = sorted({
+            account_no for account_no, _, _ in payments
+            if account_no not in destinations or not destinations[account_no].is_active
+        })
+        if missing:
+            raise ValidationError(
+                f'Destination accounts do not exist or are not active: {", ".join(missing)}'
+            )
+        if str(self.account.account_no) in destinations:
+            raise ValidationError('A batch cannot pay into your own account.')
+
+        total = sum((amount for _, amount, _ in payments), Decimal('0.00'))
+        max_transfer_amount = account_type_limits(
+            self.account.account_type_id
+        ).maximum_withdrawal_amount
+        if total > max_transfer_amount:
+            raise ValidationError(
+                f'The batch total Rs. {total} is more than the {max_transfer_amount} Rupees you can transfer'
+            )
+        if total > self.account.balance:
+            raise ValidationError(
+                f'You have Rs. {self.account.balance} in your account. '
+                f'The batch total Rs. {total} is more than your account balance.'
+            )
+
+        cleaned_data['legs'] = [
+            (account_stub(destinations[account_no]), amount, description)
+            for account_no, amount, description in payments
+        ]
+        cleaned_data['total'] = total
+        return cleaned_data
+
+
 ##FD and RD
 
 class FDApplicationForm(forms.ModelForm):
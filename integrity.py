@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+import django
+from django.apps import apps
+from django.db.models import Case, F, Sum, When, Window
+
+LEDGER_CHUNK_SIZE = 5000
+
+
+def init_worker():
+    # Worker processes started with "spawn" have not configured Django yet.
+    if not apps.ready:
+        django.setup()
+
+
+def verify_range(first_pk, last_pk):
+    """Check the ledger of every account with ``first_pk <= pk <= last_pk``.
+
+    Each account's rows are streamed in ``(timestamp, id)`` order with a
+    running ``SUM() OVER`` computed by the database. The first row whose
+    ``balance_after_transaction`` disagrees with the running sum is reported,
+    as is any account whose stored balance differs from its ledger total.
+    Returns ``(first_pk, last_pk, accounts, rows, mismatches)``.
+    """
+    # Imported here: this module is loaded by worker processes before
+    # ``init_worker`` has set Django up.
+    from accounts.models import UserBankAccount
+    from transactions.models import Transaction
+    from transactions.reports import debit_q
+
+    signed_amount = Case(
+        When(debit_q(), then=-F('amount')),
+        default=F('amount'),
+    )
+    ledger = (
+        Transaction.objects
+        .filter(account_id__gte=first_pk, account_id__lte=last_pk)
+        .annotate(running_balance=Window(
+            Sum(signed_amount),
+            partition_by=[F('account_id')],
+            order_by=[F('timestamp').asc(), F('id').asc()],
+        ))
+        .order_by('account_id', 'timestamp', 'id')
+        .values_list('account_id', 'id', 'balance_after_transaction', 'running_balance')
+        .iterator(chunk_size=LEDGER_CHUNK_SIZE)
+    )
+
+    mismatches = []
+    totals = {}
+    diverged = set()
+    rows = 0
+    for account_id, transaction_id, recorded, running in ledger:
+        rows += 1
+        totals[account_id] = running
+        if recorded != running and account_id not in diverged:
+            diverged.add(account_id)
+            mismatches.append((account_id, 'ledger_row', transaction_id, running, recorded))
+
+    accounts = 0
+    balances = (
+        UserBankAccount.objects
+        .filter(pk__gte=first_pk, pk__lte=last_pk)
+        .values_list('pk', 'balance')
+        .iterator(chunk_size=LEDGER_CHUNK_SIZE)
+    )
+    for account_id, balance in balances:
+        accounts += 1
+        expected = totals.get(account_id, Decimal('0.00'))
+        if balance != expected:
+            mismatches.append((account_id, 'account_balance', '', expected, balance))
+
+    return first_pk, last_pk, accounts, rows, mismatches
@@ -0,0 +1,123 @@
+import datetime
+import random
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from accounts.models import BankAccountType
+from transactions.benchmarks import (
+    bench_accounts,
+    seed_accounts,
+    seed_ledger,
+    time_calls,
+)
+from transactions.models import Transaction
+from transactions.pagination import paginate_keyset
+from transactions.reports import summarize
+
+LEDGER_INDEXES = (
+    'txn_account_timestamp_idx',
+    'txn_account_type_ts_idx',
+    'txn_source_account_idx',
+    'txn_destination_account_idx',
+    'txn_recipient_account_idx',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed the transaction ledger and report p50/p99 latency of the '
+        'report and counterparty-lookup queries.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=0,
+                            help='Ledger rows to seed over new benchmark accounts before measuring.')
+        parser.add_argument('--accounts', type=int, default=1000,
+                            help='Number of benchmark accounts to seed or use.')
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--compare-indexes', action='store_true',
+                            help='Also measure with the ledger indexes dropped.')
+        parser.add_argument('--i-know', action='store_true',
+                            help='Allow --compare-indexes without DEBUG; it drops '
+                                 'and rebuilds the ledger indexes of this database.')
+
+    def handle(self, *args, **options):
+        if options['compare_indexes'] and not (settings.DEBUG or options['i_know']):
+            raise CommandError(
+                '--compare-indexes drops the ledger indexes of this database. '
+                'Run it with DEBUG on, or pass --i-know.'
+            )
+
+        # Only benchmark accounts are ever written to; customer ledgers are
+        # never touched.
+        if options['rows']:
+            account_type = BankAccountType.objects.order_by('pk').first()
+            if account_type is None:
+                raise CommandError('Create at least one bank account type first.')
+            new_accounts = seed_accounts(
+                options['accounts'], account_type, rows_per_account=0, seed=options['seed']
+            )
+            accounts = list(bench_accounts().filter(
+                account_no__in=[account.account_no for account in new_accounts]
+            ))
+            written = seed_ledger(accounts, options['rows'], seed=options['seed'])
+            self.stdout.write(f'Seeded {written} ledger rows over {len(accounts)} benchmark accounts.')
+        else:
+            accounts = list(bench_accounts()[:options['accounts']])
+        if not accounts:
+            raise CommandError('No benchmark accounts exist yet; seed some with --rows.')
+
+        rng = random.Random(options['seed'])
+        queries = self.get_queries(accounts, rng)
+
+        if options['compare_indexes']:
+            indexes = [
+                index for index in Transaction._meta.indexes
+                if index.name in LEDGER_INDEXES
+            ]
+            with connection.schema_editor() as schema_editor:
+                for index in indexes:
+                    schema_editor.remove_index(Transaction, index)
+            try:
+                self.report('without indexes', queries, options['iterations'])
+            finally:
+                with connection.schema_editor() as schema_editor:
+                    for index in indexes:
+                        schema_editor.add_index(Transaction, index)
+
+        self.report('with indexes', queries, options['iterations'])
+
+    def get_queries(self, accounts, rng):
+        def report_page():
+            account = rng.choice(accounts)
+            end = timezone.now() - datetime.timedelta(days=rng.randint(0, 700))
+            queryset = Transaction.objects.filter(
+                account=account,
+                timestamp__gte=end - datetime.timedelta(days=30),
+                timestamp__lt=end,
+            )
+            list(paginate_keyset(queryset, None, 50))
+            summarize(queryset, account)
+
+        def counterparty_lookup():
+            account_no = str(rng.choice(accounts).account_no)
+            list(Transaction.objects.filter(destination_account=account_no)[:50])
+            list(Transaction.objects.filter(recipient_account=account_no)[:50])
+
+        return {
+            'report': report_page,
+            'counterparty': counterparty_lookup,
+        }
+
+    def report(self, label, queries, iterations):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{label}:'))
+        for name, query in queries.items():
+            stats = time_calls(query, iterations)
+            self.stdout.write(
+                f'  {name:<14} p50 {stats["p50"]:8.2f} ms   '
+                f'p99 {stats["p99"]:8.2f} ms   mean {stats["mean"]:8.2f} ms'
+            )
@@ -0,0 +1,129 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from accounts.models import BankAccountType
+from transactions.benchmarks import (
+    WORKLOAD_MIX,
+    bench_accounts,
+    latency_stats,
+    run_workload,
+    seed_accounts,
+    total_balance,
+)
+from transactions.integrity import verify_range
+from transactions.velocity import reset_velocity
+
+# The velocity checks still run, so their cost is measured, but with limits
+# no benchmark run reaches; each run starts from cleared counters.
+BENCHMARK_LIMITS = {
+    'MONEY_MOVEMENT_RATE_LIMIT': 10 ** 9,
+    'DAILY_OUTFLOW_LIMIT': '10000000000',
+}
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in WORKLOAD_MIX or not weight.strip().isdigit():
+            raise CommandError(
+                f'Invalid --mix entry {part!r}; use e.g. '
+                + ','.join(f'{name}={weight}' for name, weight in WORKLOAD_MIX.items())
+            )
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive concurrent deposit, withdraw, transfer, payment and report '
+        'requests through the views and report throughput, latency '
+        'percentiles, queries per request and a balance-conservation check.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', type=int, default=200,
+                            help='Benchmark accounts to seed if fewer exist.')
+        parser.add_argument('--ledger-rows', type=int, default=20,
+                            help='Ledger rows seeded per new account.')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Number of client threads.')
+        parser.add_argument('--mix', type=parse_mix, default=WORKLOAD_MIX,
+                            help='Workload weights, e.g. deposit=3,report=1.')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--max-p95', type=float, default=None,
+                            help='Fail if any workload\'s p95 latency exceeds this many ms.')
+
+    def handle(self, *args, **options):
+        accounts = list(bench_accounts())
+        missing = options['accounts'] - len(accounts)
+        if missing > 0:
+            account_type = BankAccountType.objects.order_by('pk').first()
+            if account_type is None:
+                raise CommandError('Create at least one bank account type first.')
+            accounts += seed_accounts(
+                missing, account_type, options['ledger_rows'], seed=options['seed']
+            )
+            self.stdout.write(f'Seeded {missing} benchmark accounts.')
+        accounts = list(bench_accounts()[:options['accounts']])
+        if len(accounts) < 2:
+            raise CommandError('At least two benchmark accounts are needed.')
+
+        before = total_balance(accounts)
+        reset_velocity(accounts)
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                **BENCHMARK_LIMITS
+            ):
+                elapsed, samples, balance_change = run_workload(
+                    accounts,
+                    options['requests'],
+                    options['concurrency'],
+                    mix=options['mix'],
+                    seed=options['seed'],
+                )
+        finally:
+            reset_velocity(accounts)
+        after = total_balance(accounts)
+
+        total = sum(len(rows) for rows in samples.values())
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{total} requests from {options["concurrency"]} threads in {elapsed:.1f}s: '
+            f'{total / elapsed:.1f} requests/s'
+        ))
+        slow = []
+        for name, rows in sorted(samples.items()):
+            stats = latency_stats([latency for latency, _, _ in rows])
+            queries = sum(count for _, count, _ in rows) / len(rows)
+            rejected = sum(1 for _, _, outcome in rows if outcome == 'rejected')
+            errors = sum(1 for _, _, outcome in rows if outcome == 'error')
+            self.stdout.write(
+                f'  {name:<9} {len(rows):6d} req   p50 {stats["p50"]:8.2f} ms   '
+                f'p95 {stats["p95"]:8.2f} ms   p99 {stats["p99"]:8.2f} ms   '
+                f'{queries:5.1f} queries/req   {rejected} rejected   {errors} errors'
+            )
+            if options['max_p95'] is not None and stats['p95'] > options['max_p95']:
+                slow.append(name)
+
+        # Transfers and payments stay within the benchmark accounts, so only
+        # deposits and withdrawals may change their total balance.
+        failures = []
+        expected = before + balance_change
+        if after != expected:
+            failures.append(f'total balance is Rs.{after}, expected Rs.{expected}')
+        ledger_mismatches = verify_range(accounts[0].pk, accounts[-1].pk)[4]
+        bench_pks = {account.pk for account in accounts}
+        ledger_mismatches = [row for row in ledger_mismatches if row[0] in bench_pks]
+        if ledger_mismatches:
+            failures.append(f'{len(ledger_mismatches)} ledger mismatches, e.g. {ledger_mismatches[0]}')
+        if slow:
+            failures.append(f'p95 over {options["max_p95"]} ms for {", ".join(slow)}')
+
+        if failures:
+            raise CommandError('; '.join(failures))
+        self.stdout.write(self.style.SUCCESS(
+            f'Balances conserved: Rs.{before} + Rs.{balance_change} = Rs.{after}.'
+        ))
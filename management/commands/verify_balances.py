@@ -0,0 +1,88 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Max, Min
+
+from accounts.models import UserBankAccount
+from transactions.integrity import init_worker, verify_range
+
+REPORT_FIELDS = ('account_id', 'kind', 'transaction_id', 'expected', 'recorded')
+
+
+class Command(BaseCommand):
+    help = (
+        'Verify every account ledger against its running balance and stored '
+        'balance, in parallel over account primary-key ranges.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--range-size', type=int, default=5000,
+                            help='Accounts checked per unit of work.')
+        parser.add_argument('--report', default='balance_mismatches.csv',
+                            help='CSV file mismatches are appended to.')
+        parser.add_argument('--checkpoint', default='balance_audit.checkpoint',
+                            help='File recording finished ranges.')
+        parser.add_argument('--resume', action='store_true',
+                            help='Skip ranges recorded in the checkpoint.')
+
+    def handle(self, *args, **options):
+        bounds = UserBankAccount.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            self.stdout.write('There are no accounts to verify.')
+            return
+
+        step = options['range_size']
+        ranges = [
+            (first_pk, min(first_pk + step - 1, bounds['last']))
+            for first_pk in range(bounds['first'], bounds['last'] + 1, step)
+        ]
+
+        if options['resume'] and os.path.exists(options['checkpoint']):
+            with open(options['checkpoint']) as checkpoint:
+                done = {tuple(json.loads(line)) for line in checkpoint if line.strip()}
+            ranges = [pk_range for pk_range in ranges if pk_range not in done]
+        else:
+            for path in (options['report'], options['checkpoint']):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        if not os.path.exists(options['report']):
+            with open(options['report'], 'w', newline='') as report:
+                csv.writer(report).writerow(REPORT_FIELDS)
+
+        self.stdout.write(f'Verifying {len(ranges)} account ranges with {options["workers"]} workers.')
+
+        # Workers must open their own database connections.
+        connections.close_all()
+
+        accounts = rows = mismatches = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as pool:
+            futures = [pool.submit(verify_range, *pk_range) for pk_range in ranges]
+            for future in as_completed(futures):
+                first_pk, last_pk, range_accounts, range_rows, range_mismatches = future.result()
+
+                # Record the mismatches before the checkpoint, so a resumed
+                # run never loses a finished range's findings.
+                with open(options['report'], 'a', newline='') as report:
+                    csv.writer(report).writerows(range_mismatches)
+                with open(options['checkpoint'], 'a') as checkpoint:
+                    checkpoint.write(json.dumps([first_pk, last_pk]) + '\n')
+
+                accounts += range_accounts
+                rows += range_rows
+                mismatches += len(range_mismatches)
+                self.stdout.write(
+                    f'  accounts {first_pk}-{last_pk}: {range_accounts} accounts, '
+                    f'{range_rows} rows, {len(range_mismatches)} mismatches'
+                )
+
+        style = self.style.ERROR if mismatches else self.style.SUCCESS
+        self.stdout.write(style(
+            f'Checked {accounts} accounts and {rows} ledger rows: '
+            f'{mismatches} mismatches (see {options["report"]}).'
+        ))
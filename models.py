@@ -1,3 +1,6 @@
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
 from django.db import models
 
 from .constants import TRANSACTION_TYPE_CHOICES
@@ -36,6 +39,19 @@ class Transaction(models.Model):
         ('credit_card', 'Credit Card'),
         ('bank_account', 'Bank Account')
     ])
+
+    # Interest
+    interest_period = models.CharField(max_length=7, blank=True)  # YYYY-MM
+
+    # FD/RD instalments and maturities
+    deposit_schedule = models.ForeignKey(
+        'DepositSchedule',
+        null=True,
+        blank=True,
+        related_name='postings',
+        on_delete=models.SET_NULL,
+    )
+    schedule_event = models.PositiveSmallIntegerField(null=True, blank=True)
     
 
     def __str__(self):
@@ -43,14 +59,199 @@ class Transaction(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Admin changelist: newest first across all accounts, and the
+            # date hierarchy's min/max and date-range filters.
+            models.Index(
+                fields=['timestamp', 'id'],
+                name='txn_timestamp_idx',
+            ),
+            # Report pages: one account's history in (timestamp, id) order.
+            models.Index(
+                fields=['account', 'timestamp', 'id'],
+                name='txn_account_timestamp_idx',
+            ),
+            models.Index(
+                fields=['account', 'transaction_type', 'timestamp'],
+                name='txn_account_type_ts_idx',
+            ),
+            # Counterparty lookups; most rows leave these columns empty.
+            models.Index(
+                fields=['source_account'],
+                condition=~models.Q(source_account=''),
+                name='txn_source_account_idx',
+            ),
+            models.Index(
+                fields=['destination_account'],
+                condition=~models.Q(destination_account=''),
+                name='txn_destination_account_idx',
+            ),
+            models.Index(
+                fields=['recipient_account'],
+                condition=~models.Q(recipient_account=''),
+                name='txn_recipient_account_idx',
+            ),
+        ]
+        constraints = [
+            # An account is credited interest at most once per period, so a
+            # retried interest shard can never double-credit.
+            models.UniqueConstraint(
+                fields=['account', 'interest_period'],
+                condition=~models.Q(interest_period=''),
+                name='unique_interest_per_period',
+            ),
+            # Each instalment or maturity of a deposit is posted at most
+            # once, however often a posting run is retried.
+            models.UniqueConstraint(
+                fields=['deposit_schedule', 'schedule_event'],
+                condition=models.Q(deposit_schedule__isnull=False),
+                name='unique_deposit_schedule_event',
+            ),
+        ]
+
+
+class JournalEntry(models.Model):
+    """One posting in the double-entry journal; its legs sum to zero.
+
+    The journal covers money moving between two customer accounts, i.e.
+    payments and transfers. Deposits, withdrawals, interest and deposit
+    schedule postings cross the bank's boundary, have no counter-leg on a
+    customer account and are recorded in the ``Transaction`` ledger only.
+    """
+    entry_type = models.PositiveSmallIntegerField(
+        choices=TRANSACTION_TYPE_CHOICES
+    )
+    description = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f'Journal entry {self.pk}'
+
+
+def delete_journal_entries(collector, field, sub_objs, using):
+    """``on_delete`` for ``JournalLeg.account``: deleting an account
+    deletes every entry it has a leg in, counterparties' legs included,
+    rather than leaving those entries unbalanced."""
+    models.CASCADE(collector, field, sub_objs, using)
+    collector.collect(
+        JournalEntry.objects.using(using).filter(legs__in=sub_objs),
+        source=field.remote_field.model,
+        source_attr=field.name,
+        nullable=field.null,
+        fail_on_restricted=False,
+    )
+
+
+class JournalLeg(models.Model):
+    """A signed movement on one account: negative legs take money out of
+    the account, positive legs put money in.
+
+    Legs of an entry must sum to zero; on PostgreSQL a deferred constraint
+    trigger enforces it at commit.
+    """
+    entry = models.ForeignKey(
+        JournalEntry,
+        related_name='legs',
+        on_delete=models.CASCADE,
+    )
+    account = models.ForeignKey(
+        UserBankAccount,
+        related_name='journal_legs',
+        on_delete=delete_journal_entries,
+    )
+    amount = models.DecimalField(
+        decimal_places=2,
+        max_digits=12
+    )
+    transaction = models.OneToOneField(
+        Transaction,
+        null=True,
+        blank=True,
+        related_name='journal_leg',
+        on_delete=models.SET_NULL,
+    )
+
+    def __str__(self):
+        return f'{self.account_id}: {self.amount}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'entry'], name='journal_leg_account_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=~models.Q(amount=0),
+                name='journal_leg_amount_nonzero',
+            ),
+        ]
+
+
+class DailyBalanceSnapshot(models.Model):
+    """One row per account per day with activity: the closing balance and
+    that day's turnover, so balance history never scans the ledger."""
+    account = models.ForeignKey(
+        UserBankAccount,
+        related_name='daily_balances',
+        on_delete=models.CASCADE,
+    )
+    date = models.DateField()
+    closing_balance = models.DecimalField(
+        decimal_places=2,
+        max_digits=12
+    )
+    credits = models.DecimalField(default=0, decimal_places=2, max_digits=14)
+    debits = models.DecimalField(default=0, decimal_places=2, max_digits=14)
+    transaction_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.account_id} on {self.date}'
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account', 'date'],
+                name='unique_daily_balance_snapshot',
+            ),
+        ]
+
+
+class PaymentBatch(models.Model):
+    """A bulk transfer (e.g. a payroll run) posted as one database
+    transaction; its status is how the submitter follows the batch."""
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Posted', 'Posted'),
+        ('Failed', 'Failed'),
+    ]
+
+    account = models.ForeignKey(
+        UserBankAccount,
+        related_name='payment_batches',
+        on_delete=models.CASCADE,
+    )
+    description = models.CharField(max_length=255, blank=True)
+    item_count = models.PositiveIntegerField()
+    total_amount = models.DecimalField(decimal_places=2, max_digits=14)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    posted_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'Payment batch {self.pk} - {self.status}'
 
 
 ## FD and RD
 
 # your_app/models.py
 
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings  # Import settings
+from django.core.cache import cache
+
+from .events import publish_notification
+from .page_cache import bump_ledger_versions
 
 class FDApplication(models.Model):
     STATUS_CHOICES = [
@@ -65,6 +266,12 @@ class FDApplication(models.Model):
     interest_rate = models.DecimalField(max_digits=5, decimal_places=2)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
+    reviewed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='fd_application_created_idx'),
+        ]
 
     def __str__(self):
         return f"FD Application by {self.user.username} - {self.status}"
@@ -83,6 +290,12 @@ class RDApplication(models.Model):
     interest_rate = models.DecimalField(max_digits=5, decimal_places=2)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
+    reviewed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='rd_application_created_idx'),
+        ]
 
     def __str__(self):
         return f"RD Application by {self.user.username} - {self.status}"
@@ -91,19 +304,212 @@ class RDApplication(models.Model):
 
 
 
+class DepositSchedule(models.Model):
+    """Precomputed maturity and month-by-month accrual of an approved FD or
+    RD, so listing pages never recompute it.
+
+    Amounts are integer paise. ``rows`` holds one
+    ``[month, date, deposited, interest, balance]`` list per month.
+
+    ``next_due_date`` is when the next instalment is debited from, or the
+    maturity amount credited to, the owner's account; it is cleared once
+    the deposit has matured. A late instalment moves the dates on; see
+    ``advance()``.
+    """
+    MATURITY_EVENT = 0
+
+    fd_application = models.OneToOneField(
+        FDApplication,
+        null=True,
+        blank=True,
+        related_name='schedule',
+        on_delete=models.CASCADE,
+    )
+    rd_application = models.OneToOneField(
+        RDApplication,
+        null=True,
+        blank=True,
+        related_name='schedule',
+        on_delete=models.CASCADE,
+    )
+    start_date = models.DateField()
+    maturity_date = models.DateField()
+    deposited_paise = models.BigIntegerField()
+    interest_paise = models.BigIntegerField()
+    maturity_paise = models.BigIntegerField()
+    rows = models.JSONField()
+    instalments_posted = models.PositiveIntegerField(default=0)
+    next_due_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['next_due_date', 'id'],
+                condition=models.Q(next_due_date__isnull=False),
+                name='deposit_schedule_due_idx',
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=(
+                    models.Q(fd_application__isnull=False, rd_application__isnull=True)
+                    | models.Q(fd_application__isnull=True, rd_application__isnull=False)
+                ),
+                name='deposit_schedule_one_application',
+            ),
+        ]
+
+    def __str__(self):
+        return f'Schedule maturing {self.maturity_date}'
+
+    @property
+    def instalment_count(self):
+        # A fixed deposit is paid in once, a recurring one every month.
+        return 1 if self.fd_application_id else len(self.rows)
+
+    def next_event(self):
+        """``(event, paise)`` of the next posting: instalment ``event``
+        (numbered from 1) debits ``paise``, ``MATURITY_EVENT`` credits it."""
+        if self.instalments_posted < self.instalment_count:
+            return self.instalments_posted + 1, self.rows[self.instalments_posted][2]
+        return self.MATURITY_EVENT, self.maturity_paise
+
+    def advance(self, posted_on):
+        """Move ``next_due_date`` past the event just posted on
+        ``posted_on``. Returns whether the schedule was moved back.
+
+        An instalment debited after its due date moves the rest of the
+        schedule, maturity included, back by the delay, so money paid in
+        late neither earns interest for the months it missed nor lets
+        overdue instalments and the maturity be posted all at once.
+        """
+        late = (
+            self.instalments_posted < self.instalment_count
+            and posted_on > self.next_due_date
+        )
+        if late:
+            self.reschedule(self.start_date + (posted_on - self.next_due_date))
+        if self.instalments_posted < self.instalment_count:
+            self.instalments_posted += 1
+            if self.instalments_posted < self.instalment_count:
+                self.next_due_date = self.start_date + relativedelta(months=self.instalments_posted)
+            else:
+                self.next_due_date = self.maturity_date
+        else:
+            self.next_due_date = None
+        return late
+
+    def reschedule(self, start_date):
+        """Restart the schedule's calendar on ``start_date``; the amounts
+        stay as they are."""
+        self.start_date = start_date
+        self.maturity_date = start_date + relativedelta(months=len(self.rows))
+        for row in self.rows:
+            row[1] = (start_date + relativedelta(months=row[0])).isoformat()
+
+    @property
+    def maturity_amount(self):
+        return Decimal(self.maturity_paise) / 100
+
+    @property
+    def interest_amount(self):
+        return Decimal(self.interest_paise) / 100
+
+
 class Notification(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    is_read = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Newest-first feed per user, paginated on (created_at, id).
+            models.Index(
+                fields=['user', 'created_at', 'id'],
+                name='notification_user_created_idx',
+            ),
+            models.Index(
+                fields=['user'],
+                condition=models.Q(is_read=False),
+                name='notification_unread_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'Notification for {self.user.first_name}'
 
+    @staticmethod
+    def unread_count_cache_key(user_id):
+        return f'notifications:unread:{user_id}'
 
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        super().save(*args, **kwargs)
+        # Dropped after commit, so a concurrent read cannot cache the count
+        # from before this change again.
+        key = self.unread_count_cache_key(self.user_id)
+        transaction.on_commit(lambda: cache.delete(key))
+        bump_ledger_versions([self.user_id])
+        if created:
+            publish_notification(self)
 
 
+class InterestRun(models.Model):
+    """Checkpoint of a monthly interest run.
 
+    ``last_account_id`` is advanced in the same database transaction that
+    credits each chunk of accounts, so a crashed run resumes after the last
+    committed chunk instead of starting over. ``calculate_interest`` uses
+    shard ``0``; ``fan_out_interest`` numbers its shards from ``1``.
+    """
+    period = models.CharField(max_length=7)  # YYYY-MM
+    shard = models.PositiveSmallIntegerField(default=0)
+    last_account_id = models.PositiveBigIntegerField(default=0)
+    accounts_credited = models.PositiveIntegerField(default=0)
+    interest_paid = models.DecimalField(default=0, max_digits=14, decimal_places=2)
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'shard'],
+                name='unique_interest_run_shard',
+            ),
+        ]
+
+    def __str__(self):
+        return f'Interest run {self.period} (shard {self.shard})'
 
 
+class IdempotencyKey(models.Model):
+    """Client-supplied key claimed by a money-movement POST.
 
+    The key is claimed in the same database transaction as the posting, so a
+    retried request either finds the committed claim and replays the
+    original outcome, or the first attempt rolled back and it may post.
+    ``request_hash`` identifies the claiming request, so the key cannot be
+    reused for a different one. A batch upload's claim points at its
+    ``batch`` instead of a single ``transaction``.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=64)
+    request_hash = models.CharField(max_length=64, blank=True, default='')
+    transaction = models.ForeignKey(Transaction, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    batch = models.ForeignKey(PaymentBatch, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'key'],
+                name='unique_idempotency_key_per_user',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='idempotency_key_created_idx'),
+        ]
+
+    def __str__(self):
+        return self.key
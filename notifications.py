@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from transactions.events import publish_notification
+from transactions.models import Notification
+from transactions.page_cache import bump_ledger_versions
+
+UNREAD_COUNT_TIMEOUT = getattr(settings, 'NOTIFICATION_UNREAD_COUNT_TIMEOUT', 60 * 60)
+
+
+def unread_count(user):
+    """Unread notifications of ``user``, served from the cache.
+
+    The cached value is dropped whenever a notification is created or
+    marked read, so the ``COUNT(*)`` only runs after a change.
+    """
+    return cache.get_or_set(
+        Notification.unread_count_cache_key(user.pk),
+        lambda: Notification.objects.filter(user=user, is_read=False).count(),
+        UNREAD_COUNT_TIMEOUT
+    )
+
+
+def invalidate_unread_counts(user_ids):
+    """Drop the cached unread counts of ``user_ids`` once the current
+    database transaction commits, like ``bump_ledger_versions``."""
+    user_ids = set(user_ids)
+    keys = [Notification.unread_count_cache_key(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+    # Cached pages show the unread count too.
+    bump_ledger_versions(user_ids)
+
+
+def notify(notifications):
+    """``bulk_create`` the given notifications and drop the cached unread
+    counts of their recipients (``bulk_create`` bypasses ``save()``)."""
+    created = Notification.objects.bulk_create(notifications)
+    invalidate_unread_counts(notification.user_id for notification in created)
+    for notification in created:
+        publish_notification(notification)
+    return created
+
+
+def mark_read(user, notification_ids=None):
+    """Mark ``user``'s notifications read with a single ``UPDATE``; all of
+    them unless ``notification_ids`` is given."""
+    queryset = Notification.objects.filter(user=user, is_read=False)
+    if notification_ids is not None:
+        queryset = queryset.filter(pk__in=notification_ids)
+
+    updated = queryset.update(is_read=True)
+    if updated:
+        invalidate_unread_counts([user.pk])
+    return updated
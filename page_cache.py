@@ -0,0 +1,118 @@
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 10 * 60)
+
+
+def ledger_version_key(user_id):
+    return f'ledger:version:{user_id}'
+
+
+def ledger_modified_key(user_id):
+    return f'ledger:modified:{user_id}'
+
+
+def ledger_version(user_id):
+    """``(version, modified)`` of ``user_id``'s ledger: a counter bumped by
+    every posting, application or notification change, and the time of the
+    last bump in seconds since the epoch.
+
+    A missing counter restarts from the current time in milliseconds rather
+    than from 1, so a version handed out before the cache lost it is never
+    reused.
+    """
+    keys = (ledger_version_key(user_id), ledger_modified_key(user_id))
+    values = cache.get_many(keys)
+    if keys[0] not in values or keys[1] not in values:
+        now = time.time()
+        cache.add(keys[0], int(now * 1000), None)
+        cache.add(keys[1], int(now), None)
+        values = cache.get_many(keys)
+    return values[keys[0]], values[keys[1]]
+
+
+def bump_ledger_versions(user_ids):
+    """Invalidate the cached pages of ``user_ids`` once the current
+    database transaction commits, so a page is never cached under the new
+    version from data that has not committed yet."""
+    user_ids = set(user_ids)
+
+    def bump():
+        now = time.time()
+        for user_id in user_ids:
+            try:
+                cache.incr(ledger_version_key(user_id))
+            except ValueError:
+                cache.set(ledger_version_key(user_id), int(now * 1000), None)
+        cache.set_many(
+            {ledger_modified_key(user_id): int(now) for user_id in user_ids},
+            None
+        )
+
+    if user_ids:
+        transaction.on_commit(bump)
+
+
+@receiver(post_save, sender='transactions.FDApplication')
+@receiver(post_delete, sender='transactions.FDApplication')
+@receiver(post_save, sender='transactions.RDApplication')
+@receiver(post_delete, sender='transactions.RDApplication')
+def bump_application_owner(instance, **kwargs):
+    bump_ledger_versions([instance.user_id])
+
+
+def cached_user_page(view):
+    """Serve a GET view per user from the cache, with conditional GET.
+
+    The ETag and ``Last-Modified`` come from the user's ledger version, so
+    a repeat navigation gets a ``304`` and a changed ledger a fresh page.
+    The cache key also carries the session key: the page embeds that
+    session's CSRF token. Requests with pending messages are rendered
+    normally and never cached. Apply below ``login_required``.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+            return view(request, *args, **kwargs)
+
+        version, modified = ledger_version(request.user.pk)
+        session = hashlib.sha256(
+            (request.session.session_key or '').encode()
+        ).hexdigest()[:16]
+        etag = quote_etag(f'{view.__name__}-{version}-{session}')
+
+        response = get_conditional_response(request, etag=etag, last_modified=modified)
+        if response is None:
+            key = f'page:{request.user.pk}:{session}:{view.__name__}:{request.get_full_path()}:{version}'
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming or response.cookies:
+                    return response
+                cache.set(key, (response.content, response['Content-Type']), PAGE_CACHE_TIMEOUT)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+
+    return wrapper
@@ -0,0 +1,220 @@
+import contextlib
+import functools
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Duplicate query fingerprints logged per profiled request or task.
+PROFILING_LOGGED_DUPLICATES = 3
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_literal_lists = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """``sql`` with literals and ``IN`` lists collapsed, so the same query
+    run with different parameters has the same fingerprint."""
+    sql = _literal_lists.sub('(...)', sql)
+    return _literals.sub('?', sql)
+
+
+def sample_rate():
+    """Fraction of requests and tasks profiled; 0 turns profiling off. Read
+    on every request, so it can be changed without a restart."""
+    return getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+
+
+def sampled():
+    rate = sample_rate()
+    return rate > 0 and random.random() < rate
+
+
+class QueryRecorder:
+    """``execute_wrapper`` counting the queries, database time and repeated
+    fingerprints of one request or task."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        return [
+            (sql, count)
+            for sql, count in self.fingerprints.most_common()
+            if count > 1
+        ]
+
+    @contextlib.contextmanager
+    def wrap(self):
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+
+class Metrics:
+    """Per-process totals for profiled views and tasks, rendered in the
+    Prometheus text format. Each worker process reports its own totals."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = defaultdict(lambda: {
+            'count': 0,
+            'seconds': 0.0,
+            'db_seconds': 0.0,
+            'queries': 0,
+            'duplicate_queries': 0,
+            'buckets': [0] * len(DURATION_BUCKETS),
+        })
+
+    def observe(self, kind, name, elapsed, recorder):
+        duplicates = sum(count - 1 for _, count in recorder.duplicates)
+        with self.lock:
+            series = self.series[kind, name]
+            series['count'] += 1
+            series['seconds'] += elapsed
+            series['db_seconds'] += recorder.duration
+            series['queries'] += recorder.count
+            series['duplicate_queries'] += duplicates
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if elapsed <= bound:
+                    series['buckets'][index] += 1
+
+    def render(self):
+        with self.lock:
+            series = {key: dict(value, buckets=list(value['buckets'])) for key, value in self.series.items()}
+
+        lines = []
+        for kind in ('view', 'task'):
+            rows = sorted((name, value) for (row_kind, name), value in series.items() if row_kind == kind)
+            prefix = f'transactions_{kind}'
+            lines += [
+                f'# HELP {prefix}_duration_seconds Wall time of sampled {kind}s.',
+                f'# TYPE {prefix}_duration_seconds histogram',
+            ]
+            for name, value in rows:
+                for bound, count in zip(DURATION_BUCKETS, value['buckets']):
+                    lines.append(f'{prefix}_duration_seconds_bucket{{{kind}="{name}",le="{bound}"}} {count}')
+                lines.append(f'{prefix}_duration_seconds_bucket{{{kind}="{name}",le="+Inf"}} {value["count"]}')
+                lines.append(f'{prefix}_duration_seconds_sum{{{kind}="{name}"}} {value["seconds"]:.6f}')
+                lines.append(f'{prefix}_duration_seconds_count{{{kind}="{name}"}} {value["count"]}')
+            for metric, help_text in (
+                ('db_seconds', 'Database time'),
+                ('queries', 'Queries run'),
+                ('duplicate_queries', 'Queries repeating an earlier fingerprint'),
+            ):
+                lines += [
+                    f'# HELP {prefix}_{metric}_total {help_text} in sampled {kind}s.',
+                    f'# TYPE {prefix}_{metric}_total counter',
+                ]
+                for name, value in rows:
+                    lines.append(f'{prefix}_{metric}_total{{{kind}="{name}"}} {value[metric]}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def record(kind, name, elapsed, recorder, **extra):
+    metrics.observe(kind, name, elapsed, recorder)
+    logger.info(
+        'profile kind=%s name=%s total_ms=%.1f db_ms=%.1f queries=%d duplicates=%s%s',
+        kind,
+        name,
+        elapsed * 1000,
+        recorder.duration * 1000,
+        recorder.count,
+        recorder.duplicates[:PROFILING_LOGGED_DUPLICATES],
+        ''.join(f' {key}={value}' for key, value in extra.items()),
+    )
+
+
+class ProfilingMiddleware:
+    """Profile a ``PROFILING_SAMPLE_RATE`` fraction of requests.
+
+    Add ``transactions.profiling.ProfilingMiddleware`` to ``MIDDLEWARE``.
+    Unsampled requests pay for one ``random()`` call. Runs under both WSGI
+    and ASGI; streaming responses are not recorded, as their body is
+    produced after the middleware has returned.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not sampled():
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with QueryRecorder().wrap() as recorder:
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    async def __acall__(self, request):
+        if not sampled():
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        with QueryRecorder().wrap() as recorder:
+            response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    def record(self, request, response, elapsed, recorder):
+        if response.streaming:
+            return
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        record('view', view, elapsed, recorder, status=response.status_code)
+
+
+_running_tasks = {}
+
+
+@task_prerun.connect
+def start_task_profile(task_id=None, task=None, **kwargs):
+    if not sampled():
+        return
+    stack = contextlib.ExitStack()
+    recorder = stack.enter_context(QueryRecorder().wrap())
+    _running_tasks[task_id] = (time.perf_counter(), stack, recorder)
+
+
+@task_postrun.connect
+def finish_task_profile(task_id=None, task=None, state=None, **kwargs):
+    running = _running_tasks.pop(task_id, None)
+    if running is None:
+        return
+    started, stack, recorder = running
+    stack.close()
+    record('task', task.name, time.perf_counter() - started, recorder, state=state)
@@ -0,0 +1,246 @@
+import csv
+import datetime
+import functools
+import json
+import re
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import CharField, Count, Q, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from transactions.models import DailyBalanceSnapshot
+from transactions.constants import (
+    PAYMENT,
+    TRANSACTION_TYPE_CHOICES,
+    TRANSFER,
+    WITHDRAWAL,
+)
+
+FINANCIAL_YEAR_START_MONTH = getattr(settings, 'FINANCIAL_YEAR_START_MONTH', 4)
+DATERANGE_PRESETS = (
+    ('last_7_days', 'Last 7 days'),
+    ('last_30_days', 'Last 30 days'),
+    ('last_90_days', 'Last 90 days'),
+    ('this_month', 'This month'),
+    ('this_fy', 'This financial year'),
+)
+
+# "start - end", "start -", "- end" or a lone "start".
+_daterange = re.compile(
+    r'^\s*(\d{4}-\d{2}-\d{2})?\s*(?:-\s*(\d{4}-\d{2}-\d{2})?)?\s*$'
+)
+
+
+def day_start(date):
+    value = datetime.datetime.combine(date, datetime.time.min)
+    if settings.USE_TZ:
+        value = timezone.make_aware(value)
+    return value
+
+
+def daterange_bounds(start_date, end_date):
+    """Turn inclusive ``start_date`` and ``end_date`` into a half-open
+    ``[start, end)`` datetime range; a missing date leaves that end open.
+
+    Filtering ``timestamp >= start AND timestamp < end`` lets the database
+    use the ``(account, timestamp)`` index; ``timestamp__date__range`` casts
+    every row and cannot.
+    """
+    return (
+        day_start(start_date) if start_date else None,
+        day_start(end_date + datetime.timedelta(days=1)) if end_date else None,
+    )
+
+
+def filter_timestamps(queryset, start, end):
+    if start is not None:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end is not None:
+        queryset = queryset.filter(timestamp__lt=end)
+    return queryset
+
+
+@functools.lru_cache(maxsize=256)
+def parse_daterange(value):
+    """``(start_date, end_date)`` of a ``"YYYY-MM-DD - YYYY-MM-DD"`` range,
+    either side of which may be left out. Raises ``ValueError``."""
+    match = _daterange.match(value)
+    if match is None or not any(match.groups()):
+        raise ValueError(f'Invalid date range: {value!r}')
+    return tuple(
+        datetime.date.fromisoformat(date) if date else None
+        for date in match.groups()
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def preset_dates(preset, today):
+    """Inclusive ``(start_date, end_date)`` of a ``DATERANGE_PRESETS`` range
+    ending ``today``."""
+    if preset.startswith('last_'):
+        days = int(preset.split('_')[1])
+        return today - datetime.timedelta(days=days - 1), today
+    if preset == 'this_month':
+        return today.replace(day=1), today
+    if preset == 'this_fy':
+        year = today.year if today.month >= FINANCIAL_YEAR_START_MONTH else today.year - 1
+        return datetime.date(year, FINANCIAL_YEAR_START_MONTH, 1), today
+    raise ValueError(f'Unknown date range preset: {preset!r}')
+
+
+def debit_q(account=None):
+    """Rows of ``account``'s ledger that took money out of the account.
+
+    Deposits and interest are always credits and withdrawals always debits.
+    Transfers and payments are written for both sides: the sender's row is
+    the one whose ``source_account`` is the account itself (transfers) or
+    which names a ``recipient_account`` (payments). Without ``account`` the
+    comparison is made against each row's own account.
+    """
+    if account is None:
+        account_no = Cast('account__account_no', output_field=CharField())
+    else:
+        account_no = str(account.account_no)
+
+    return (
+        Q(transaction_type=WITHDRAWAL)
+        | Q(transaction_type=TRANSFER, source_account=account_no)
+        | (Q(transaction_type=PAYMENT) & ~Q(recipient_account=''))
+    )
+
+
+def summarize(queryset, account):
+    """Credit/debit totals and per-type counts of ``queryset`` in one query."""
+    debits = debit_q(account)
+    rows = (
+        queryset
+        .order_by()
+        .values('transaction_type')
+        .annotate(
+            count=Count('pk'),
+            credits=Sum('amount', filter=~debits),
+            debits=Sum('amount', filter=debits),
+        )
+        .order_by('transaction_type')
+    )
+
+    labels = dict(TRANSACTION_TYPE_CHOICES)
+    summary = {
+        'count': 0,
+        'credits': Decimal('0.00'),
+        'debits': Decimal('0.00'),
+        'by_type': [],
+    }
+    for row in rows:
+        credits = row['credits'] or Decimal('0.00')
+        debits = row['debits'] or Decimal('0.00')
+        summary['count'] += row['count']
+        summary['credits'] += credits
+        summary['debits'] += debits
+        summary['by_type'].append({
+            'transaction_type': row['transaction_type'],
+            'label': labels.get(row['transaction_type']),
+            'count': row['count'],
+            'credits': credits,
+            'debits': debits,
+        })
+    summary['net'] = summary['credits'] - summary['debits']
+    return summary
+
+
+def balance_on(account, date):
+    """Closing balance of ``account`` on ``date`` from the latest snapshot
+    at or before it; a single index lookup regardless of ledger size."""
+    snapshot = (
+        DailyBalanceSnapshot.objects
+        .filter(account=account, date__lte=date)
+        .order_by('-date')
+        .values_list('closing_balance', flat=True)
+        .first()
+    )
+    return snapshot if snapshot is not None else Decimal('0.00')
+
+
+def daily_balances(account, start_date=None, end_date=None):
+    snapshots = DailyBalanceSnapshot.objects.filter(account=account)
+    if start_date is not None:
+        snapshots = snapshots.filter(date__gte=start_date)
+    if end_date is not None:
+        snapshots = snapshots.filter(date__lte=end_date)
+    return snapshots.order_by('date')
+
+
+EXPORT_FIELDS = (
+    'id',
+    'timestamp',
+    'transaction_type',
+    'amount',
+    'balance_after_transaction',
+    'description',
+    'source_account',
+    'destination_account',
+    'recipient_name',
+    'recipient_account',
+    'payment_method',
+)
+EXPORT_CHUNK_SIZE = 2000
+# Free-text columns a spreadsheet could read as a formula.
+EXPORT_TEXT_FIELDS = (
+    'description',
+    'source_account',
+    'destination_account',
+    'recipient_name',
+    'recipient_account',
+    'payment_method',
+)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo:
+    """File-like object whose ``write`` hands the value back, so
+    ``csv.writer`` can be used to format rows one at a time."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset):
+    """Yield ledger rows as dicts, reading them through a server-side cursor."""
+    labels = dict(TRANSACTION_TYPE_CHOICES)
+    rows = (
+        queryset
+        .order_by('timestamp', 'pk')
+        .values_list(*EXPORT_FIELDS)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for row in rows:
+        record = dict(zip(EXPORT_FIELDS, row))
+        record['timestamp'] = record['timestamp'].isoformat()
+        record['transaction_type'] = labels.get(record['transaction_type'])
+        record['amount'] = str(record['amount'])
+        record['balance_after_transaction'] = str(record['balance_after_transaction'])
+        yield record
+
+
+def escape_formula(value):
+    """Prefix ``value`` with a quote if a spreadsheet would otherwise
+    evaluate it as a formula."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def export_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for record in export_rows(queryset):
+        for field in EXPORT_TEXT_FIELDS:
+            record[field] = escape_formula(record[field])
+        yield writer.writerow(record.values())
+
+
+def export_jsonl(queryset):
+    for record in export_rows(queryset):
+        yield json.dumps(record) + '\n'
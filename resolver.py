@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from accounts.models import UserBankAccount
+
+LOCAL_CACHE_SIZE = getattr(settings, 'ACCOUNT_RESOLVER_LOCAL_SIZE', 4096)
+LOCAL_CACHE_TIMEOUT = 60
+SHARED_CACHE_TIMEOUT = getattr(settings, 'ACCOUNT_RESOLVER_TIMEOUT', 5 * 60)
+
+ResolvedAccount = namedtuple('ResolvedAccount', ['account_no', 'pk', 'user_id', 'is_active'])
+
+
+class LRUCache:
+    """Small thread-safe LRU with a per-entry expiry."""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+
+_local = LRUCache(LOCAL_CACHE_SIZE, LOCAL_CACHE_TIMEOUT)
+
+
+def cache_key(account_no):
+    return f'accounts:resolve:{account_no}'
+
+
+def resolve_accounts(account_nos):
+    """Map each existing account number in ``account_nos`` to a
+    ``ResolvedAccount``; unknown numbers are left out.
+
+    Lookups go to the in-process LRU, then the shared cache, and only the
+    remaining misses to the database, all in one ``account_no__in`` query.
+    Unknown numbers are not cached, so a new account resolves immediately.
+    """
+    resolved = {}
+    misses = []
+    for account_no in {str(account_no).strip() for account_no in account_nos}:
+        if not account_no.isdigit():
+            continue
+        hit = _local.get(account_no)
+        if hit is None:
+            misses.append(account_no)
+        else:
+            resolved[account_no] = hit
+
+    if misses:
+        shared = cache.get_many([cache_key(account_no) for account_no in misses])
+        for account_no in misses:
+            hit = shared.get(cache_key(account_no))
+            if hit is not None:
+                hit = ResolvedAccount(*hit)
+                resolved[account_no] = hit
+                _local.set(account_no, hit)
+        misses = [account_no for account_no in misses if account_no not in resolved]
+
+    if misses:
+        found = {}
+        rows = UserBankAccount.objects.filter(account_no__in=misses).values_list(
+            'account_no', 'pk', 'user_id', 'user__is_active'
+        )
+        for account_no, pk, user_id, is_active in rows:
+            hit = ResolvedAccount(str(account_no), pk, user_id, is_active)
+            resolved[hit.account_no] = hit
+            found[cache_key(hit.account_no)] = tuple(hit)
+            _local.set(hit.account_no, hit)
+        cache.set_many(found, SHARED_CACHE_TIMEOUT)
+
+    return resolved
+
+
+def resolve_account(account_no):
+    return resolve_accounts([account_no]).get(str(account_no).strip())
+
+
+def account_stub(resolved):
+    """An unsaved ``UserBankAccount`` carrying just enough of a resolved
+    counterparty for the posting services, which lock and re-read the row."""
+    return UserBankAccount(
+        pk=resolved.pk,
+        account_no=resolved.account_no,
+        user_id=resolved.user_id,
+    )
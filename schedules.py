@@ -0,0 +1,185 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from transactions.models import DepositSchedule, FDApplication, RDApplication
+from transactions.page_cache import bump_ledger_versions
+from transactions.services import refund_schedule_postings
+
+SCHEDULE_BATCH_SIZE = 1000
+
+# Interest is accrued monthly on the credited balance and credited
+# (compounded) every quarter and at maturity.
+COMPOUNDING_MONTHS = 3
+
+# ``DepositSchedule`` field pointing at each application model.
+APPLICATION_FIELDS = {
+    FDApplication: 'fd_application',
+    RDApplication: 'rd_application',
+}
+
+
+def to_paise(amount):
+    return int((Decimal(amount) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_paise(paise):
+    return Decimal(paise).scaleb(-2)
+
+
+def to_basis_points(rate):
+    return int((Decimal(rate) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def divide_round(numerator, denominator):
+    """Integer division rounding half up, for non-negative operands."""
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def accrual_rows(initial, monthly, rate_bp, tenure):
+    """Month-by-month ``(month, deposited, interest, balance)`` of a deposit,
+    all in integer paise.
+
+    ``initial`` is deposited in the first month and ``monthly`` every
+    month; a fixed deposit has ``monthly == 0`` and a recurring deposit
+    ``initial == 0``.
+    """
+    credited = 0
+    uncredited = 0
+    rows = []
+    for month in range(1, tenure + 1):
+        deposited = monthly + (initial if month == 1 else 0)
+        credited += deposited
+        # rate_bp / 100 percent a year is rate_bp / 120000 a month.
+        interest = divide_round(credited * rate_bp, 120000)
+        uncredited += interest
+        if month % COMPOUNDING_MONTHS == 0 or month == tenure:
+            credited += uncredited
+            uncredited = 0
+        rows.append((month, deposited, interest, credited + uncredited))
+    return rows
+
+
+def first_due(start_date, maturity_date, instalment_count, today):
+    """``(instalments_posted, next_due_date)`` of a schedule that starts
+    posting on ``today``.
+
+    Instalments dated before ``today`` are taken as settled outside the
+    ledger, so a deposit that started in the past is not debited for all of
+    them at once; ``next_due_date`` is ``None`` if it has matured too.
+    """
+    posted = 0
+    while posted < instalment_count and start_date + relativedelta(months=posted) < today:
+        posted += 1
+    if posted < instalment_count:
+        return posted, start_date + relativedelta(months=posted)
+    return posted, maturity_date if maturity_date >= today else None
+
+
+def build_schedules(model, application_ids=None):
+    """Compute and store schedules for approved ``model`` deposits that don't
+    have one yet, in a single pass over their terms loaded as columns.
+
+    A fixed deposit pays in ``amount`` once; a recurring deposit pays in
+    ``monthly_amount`` every month. Applications without a positive tenure
+    have nothing to schedule and are skipped.
+    """
+    recurring = model is RDApplication
+    applications = model.objects.filter(
+        status='Approved',
+        schedule__isnull=True,
+        tenure__gt=0
+    )
+    if application_ids is not None:
+        applications = applications.filter(pk__in=application_ids)
+
+    terms = list(
+        applications
+        .annotate(start=Coalesce('reviewed_at', 'created_at'))
+        .values_list(
+            'pk',
+            'user_id',
+            'monthly_amount' if recurring else 'amount',
+            'interest_rate',
+            'tenure',
+            'start'
+        )
+    )
+    if not terms:
+        return 0
+
+    pks, user_ids, amounts, rates, tenures, starts = zip(*terms)
+    amounts = [to_paise(amount) for amount in amounts]
+    rates = [to_basis_points(rate) for rate in rates]
+    start_dates = [
+        timezone.localdate(start) if timezone.is_aware(start) else start.date()
+        for start in starts
+    ]
+
+    application_field = f'{APPLICATION_FIELDS[model]}_id'
+    today = timezone.localdate()
+    schedules = []
+    for pk, amount, rate_bp, tenure, start_date in zip(
+        pks, amounts, rates, tenures, start_dates
+    ):
+        initial, monthly = (0, amount) if recurring else (amount, 0)
+        rows = accrual_rows(initial, monthly, rate_bp, tenure)
+        deposited = initial + monthly * tenure
+        maturity = rows[-1][3]
+        maturity_date = start_date + relativedelta(months=tenure)
+        instalments_posted, next_due_date = first_due(
+            start_date, maturity_date, tenure if recurring else 1, today
+        )
+        schedules.append(DepositSchedule(
+            start_date=start_date,
+            maturity_date=maturity_date,
+            deposited_paise=deposited,
+            interest_paise=maturity - deposited,
+            maturity_paise=maturity,
+            instalments_posted=instalments_posted,
+            next_due_date=next_due_date,
+            rows=[
+                [month, (start_date + relativedelta(months=month)).isoformat(), paid_in, interest, balance]
+                for month, paid_in, interest, balance in rows
+            ],
+            **{application_field: pk}
+        ))
+
+    DepositSchedule.objects.bulk_create(schedules, batch_size=SCHEDULE_BATCH_SIZE)
+    bump_ledger_versions(user_ids)
+    return len(schedules)
+
+
+def cancel_schedules(model, application_ids):
+    """Stop the schedules of ``model`` applications that are no longer
+    approved, in the caller's transaction. Returns ``(deleted, refunded)``.
+
+    Instalments already debited are paid back to the owner's account and
+    the schedules are deleted, so a later approval builds them afresh; the
+    ledger rows they posted stay, unlinked. Schedules of deposits that have
+    already matured are kept.
+    """
+    field = APPLICATION_FIELDS[model]
+    stopped = list(
+        DepositSchedule.objects
+        .filter(**{f'{field}_id__in': application_ids}, next_due_date__isnull=False)
+        .annotate(account_id=F(f'{field}__user__account'))
+        .order_by('pk')
+        .select_for_update(of=('self',))
+    )
+    refunded = refund_schedule_postings(
+        [schedule for schedule in stopped if schedule.instalments_posted]
+    )
+    DepositSchedule.objects.filter(pk__in=[schedule.pk for schedule in stopped]).delete()
+    return len(stopped), refunded
+
+
+def build_fd_schedules(application_ids=None):
+    return build_schedules(FDApplication, application_ids)
+
+
+def build_rd_schedules(application_ids=None):
+    return build_schedules(RDApplication, application_ids)
@@ -0,0 +1,143 @@
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from transactions.models import Transaction
+
+SEARCH_PAGE_SIZE = 50
+# Partial account numbers shorter than this match too much to be useful.
+MIN_ACCOUNT_SEARCH_LENGTH = 3
+
+# Counterparty account numbers as one string; the same expression is indexed
+# by migration 0024, so it must not change without a new migration.
+COUNTERPARTY_SQL = "(source_account || ' ' || destination_account || ' ' || recipient_account)"
+
+
+def sqlite_fts_trigram():
+    # FTS5's trigram tokenizer (substring matching) arrived in SQLite 3.34.
+    return connection.Database.sqlite_version_info >= (3, 34)
+
+
+def date_filters(start, end):
+    sql, params = '', []
+    if start is not None:
+        sql += ' AND timestamp >= %s'
+        params.append(connection.ops.adapt_datetimefield_value(start))
+    if end is not None:
+        sql += ' AND timestamp < %s'
+        params.append(connection.ops.adapt_datetimefield_value(end))
+    return sql, params
+
+
+def postgresql_search(account_id, query, start, end):
+    """``(select, params, order, order_params)``: the ids of the matching
+    rows and the ranking to order them by."""
+    dates, date_params = date_filters(start, end)
+    if query.isdigit():
+        # Partial account number: answered by the trigram index.
+        select = f"""
+            SELECT id FROM transactions_transaction
+            WHERE account_id = %s AND {COUNTERPARTY_SQL} LIKE %s{dates}
+        """
+        params = [account_id, f'%{query}%', *date_params]
+        order = f'similarity({COUNTERPARTY_SQL}, %s) DESC, timestamp DESC, id DESC'
+    else:
+        select = f"""
+            SELECT id FROM transactions_transaction
+            WHERE account_id = %s
+              AND search_vector @@ websearch_to_tsquery('simple', %s){dates}
+        """
+        params = [account_id, query, *date_params]
+        order = (
+            "ts_rank(search_vector, websearch_to_tsquery('simple', %s)) DESC, "
+            'timestamp DESC, id DESC'
+        )
+    return select, params, order, [query]
+
+
+def sqlite_search(account_id, query, start, end):
+    dates, date_params = date_filters(start, end)
+    terms = query.split()
+    if not sqlite_fts_trigram():
+        # Word tokens: match terms as prefixes instead of substrings.
+        match = ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+    else:
+        match = ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+    select = f"""
+        SELECT transactions_transaction.id
+        FROM transactions_transaction_fts
+        JOIN transactions_transaction
+          ON transactions_transaction.id = transactions_transaction_fts.rowid
+        WHERE transactions_transaction_fts MATCH %s AND account_id = %s{dates}
+    """
+    order = 'bm25(transactions_transaction_fts), timestamp DESC, transactions_transaction.id DESC'
+    return select, [match, account_id, *date_params], order, []
+
+
+def icontains_search(account, query, start, end):
+    matches = Q()
+    for field in ('description', 'recipient_name', 'source_account',
+                  'destination_account', 'recipient_account'):
+        matches |= Q(**{f'{field}__icontains': query})
+    queryset = Transaction.objects.filter(matches, account=account)
+    if start is not None:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end is not None:
+        queryset = queryset.filter(timestamp__lt=end)
+    return queryset
+
+
+def searchable(query):
+    return bool(query) and not (query.isdigit() and len(query) < MIN_ACCOUNT_SEARCH_LENGTH)
+
+
+def search_transactions(account, query, start=None, end=None, page=1, page_size=SEARCH_PAGE_SIZE):
+    """One page of ``account``'s ledger rows matching ``query`` in the
+    description, recipient name or counterparty account numbers, best match
+    first. Returns ``(rows, has_next)``.
+
+    PostgreSQL ranks a weighted full-text vector held in a generated
+    ``search_vector`` column, and a query of digits matches partial account
+    numbers through a trigram index. SQLite searches an FTS5 table kept in
+    step by triggers, for local development. Other databases fall back to
+    an unranked ``icontains`` scan of the account's rows.
+    """
+    query = query.strip()
+    if not searchable(query):
+        return [], False
+
+    limit = page_size + 1
+    offset = (page - 1) * page_size
+    if connection.vendor in ('postgresql', 'sqlite'):
+        build = postgresql_search if connection.vendor == 'postgresql' else sqlite_search
+        select, params, order, order_params = build(account.pk, query, start, end)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'{select} ORDER BY {order} LIMIT %s OFFSET %s',
+                [*params, *order_params, limit, offset]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+    else:
+        ids = list(
+            icontains_search(account, query, start, end)
+            .order_by('-timestamp', '-id')
+            .values_list('id', flat=True)[offset:offset + limit]
+        )
+
+    has_next = len(ids) > page_size
+    ids = ids[:page_size]
+    rows = Transaction.objects.in_bulk(ids)
+    return [rows[pk] for pk in ids if pk in rows], has_next
+
+
+def search_queryset(account, query, start=None, end=None):
+    """Every row ``search_transactions`` would page through, unordered, as
+    a queryset to aggregate over."""
+    query = query.strip()
+    if not searchable(query):
+        return Transaction.objects.none()
+    if connection.vendor in ('postgresql', 'sqlite'):
+        build = postgresql_search if connection.vendor == 'postgresql' else sqlite_search
+        select, params, _, _ = build(account.pk, query, start, end)
+        return Transaction.objects.filter(account=account, pk__in=RawSQL(select, params))
+    return icontains_search(account, query, start, end)
@@ -0,0 +1,459 @@
+import logging
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from accounts.models import UserBankAccount
+from transactions.account_context import account_type_limits
+from transactions.events import publish_balance
+from transactions.page_cache import bump_ledger_versions
+from transactions.constants import DEPOSIT, PAYMENT, TRANSFER, WITHDRAWAL
+from transactions.models import (
+    DailyBalanceSnapshot,
+    JournalEntry,
+    JournalLeg,
+    PaymentBatch,
+    Transaction,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def lock_accounts(*accounts):
+    """Lock the given accounts with ``SELECT ... FOR UPDATE`` and return the
+    fresh rows keyed by pk, annotated with their owner's ``is_active``.
+
+    Rows are always locked in primary-key order so two postings touching the
+    same pair of accounts can never deadlock. Must be called inside
+    ``transaction.atomic()``.
+    """
+    pks = sorted({account.pk for account in accounts})
+    locked = (
+        UserBankAccount.objects
+        .select_for_update(of=('self',))
+        .annotate(user_is_active=F('user__is_active'))
+        .filter(pk__in=pks)
+        .order_by('pk')
+    )
+    return {account.pk: account for account in locked}
+
+
+def record_daily_balance(account, balance, credit=0, debit=0):
+    """Fold a posting into today's ``DailyBalanceSnapshot`` for ``account``.
+
+    Called with the account row locked, so the update-then-create below
+    cannot race another posting to the same account.
+    """
+    today = timezone.localdate()
+    updated = DailyBalanceSnapshot.objects.filter(
+        account_id=account.pk,
+        date=today
+    ).update(
+        closing_balance=balance,
+        credits=F('credits') + credit,
+        debits=F('debits') + debit,
+        transaction_count=F('transaction_count') + 1
+    )
+    if not updated:
+        DailyBalanceSnapshot.objects.create(
+            account_id=account.pk,
+            date=today,
+            closing_balance=balance,
+            credits=credit,
+            debits=debit,
+            transaction_count=1
+        )
+
+
+def record_daily_balances(changes):
+    """Bulk form of ``record_daily_balance`` for postings that touch many
+    accounts. ``changes`` maps account pk to
+    ``(balance, credit, debit, transaction_count)``; the accounts must be
+    locked by the caller."""
+    today = timezone.localdate()
+    snapshots = {
+        snapshot.account_id: snapshot
+        for snapshot in DailyBalanceSnapshot.objects.filter(
+            account_id__in=changes,
+            date=today
+        )
+    }
+    for account_pk, (balance, credit, debit, count) in changes.items():
+        snapshot = snapshots.setdefault(account_pk, DailyBalanceSnapshot(
+            account_id=account_pk,
+            date=today,
+            credits=0,
+            debits=0,
+            transaction_count=0
+        ))
+        snapshot.closing_balance = balance
+        snapshot.credits += credit
+        snapshot.debits += debit
+        snapshot.transaction_count += count
+
+    DailyBalanceSnapshot.objects.bulk_create(
+        snapshots.values(),
+        update_conflicts=True,
+        unique_fields=['account', 'date'],
+        update_fields=['closing_balance', 'credits', 'debits', 'transaction_count']
+    )
+
+
+def create_ledger_rows(ledger_rows):
+    """Insert ``ledger_rows`` and set their primary keys, which the journal
+    legs refer to.
+
+    ``bulk_create`` only sets them on databases that return rows from a
+    bulk insert (PostgreSQL, SQLite 3.35+, MariaDB 10.5+); elsewhere the
+    rows are saved one by one.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Transaction.objects.bulk_create(ledger_rows)
+    for ledger_row in ledger_rows:
+        ledger_row.save(force_insert=True)
+    return ledger_rows
+
+
+def write_journal(entry_type, description, legs):
+    """Record a balanced journal entry for ``(account, amount, ledger_row)``
+    legs, where ``amount`` is negative for money leaving the account.
+    Ledger rows must already be saved; see ``create_ledger_rows``."""
+    if sum(amount for _, amount, _ in legs) != 0:
+        raise ValueError('Journal legs must sum to zero.')
+    if any(ledger_row is not None and ledger_row.pk is None for _, _, ledger_row in legs):
+        raise ValueError('Journal legs must refer to saved ledger rows.')
+
+    entry = JournalEntry.objects.create(
+        entry_type=entry_type,
+        description=description
+    )
+    JournalLeg.objects.bulk_create([
+        JournalLeg(
+            entry=entry,
+            account_id=account.pk,
+            amount=amount,
+            transaction_id=ledger_row.pk if ledger_row else None
+        )
+        for account, amount, ledger_row in legs
+    ])
+    return entry
+
+
+def check_balance(account, amount):
+    if amount > account.balance:
+        raise ValidationError(
+            f'You have Rs. {account.balance} in your account. '
+            'You can not use more than your account balance'
+        )
+
+
+def post_deposit(account, amount, **details):
+    with transaction.atomic():
+        locked = lock_accounts(account)[account.pk]
+        update = {'balance': F('balance') + amount}
+
+        if not locked.initial_deposit_date:
+            now = timezone.now()
+            next_interest_month = int(
+                12 / account_type_limits(
+                    locked.account_type_id
+                ).interest_calculation_per_year
+            )
+            update['initial_deposit_date'] = now
+            update['interest_start_date'] = (
+                now + relativedelta(
+                    months=+next_interest_month
+                )
+            )
+
+        UserBankAccount.objects.filter(pk=account.pk).update(**update)
+        balance = locked.balance + amount
+        ledger_row = Transaction.objects.create(
+            account=account,
+            amount=amount,
+            balance_after_transaction=balance,
+            transaction_type=DEPOSIT,
+            **details
+        )
+        record_daily_balance(account, balance, credit=amount)
+        bump_ledger_versions([account.user_id])
+
+    account.balance = balance
+    publish_balance(account)
+    return ledger_row
+
+
+def post_withdrawal(account, amount, **details):
+    with transaction.atomic():
+        locked = lock_accounts(account)[account.pk]
+        check_balance(locked, amount)
+
+        UserBankAccount.objects.filter(pk=account.pk).update(
+            balance=F('balance') - amount
+        )
+        balance = locked.balance - amount
+        ledger_row = Transaction.objects.create(
+            account=account,
+            amount=amount,
+            balance_after_transaction=balance,
+            transaction_type=WITHDRAWAL,
+            **details
+        )
+        record_daily_balance(account, balance, debit=amount)
+        bump_ledger_versions([account.user_id])
+
+    account.balance = balance
+    publish_balance(account)
+    return ledger_row
+
+
+def move_money(source, destination, amount, transaction_type,
+               source_details, destination_details):
+    """Move ``amount`` from ``source`` to ``destination`` atomically.
+
+    Both accounts are locked, the balance is re-checked against the locked
+    row, both balances are changed with ``F()`` expressions and a ledger row
+    is written for each side. Returns the source side's ledger row.
+    """
+    if source.pk == destination.pk:
+        raise ValidationError('Source and destination accounts cannot be the same.')
+
+    with transaction.atomic():
+        locked = lock_accounts(source, destination)
+        # The form resolved the destination through a cache that may still
+        # show a since deactivated owner as active.
+        if destination.pk not in locked or not locked[destination.pk].user_is_active:
+            raise ValidationError('Destination account does not exist or is not active.')
+        check_balance(locked[source.pk], amount)
+
+        UserBankAccount.objects.filter(pk=source.pk).update(
+            balance=F('balance') - amount
+        )
+        UserBankAccount.objects.filter(pk=destination.pk).update(
+            balance=F('balance') + amount
+        )
+        source_balance = locked[source.pk].balance - amount
+        destination_balance = locked[destination.pk].balance + amount
+
+        source_row, destination_row = create_ledger_rows([
+            Transaction(
+                account=source,
+                amount=amount,
+                balance_after_transaction=source_balance,
+                transaction_type=transaction_type,
+                **source_details
+            ),
+            Transaction(
+                account=destination,
+                amount=amount,
+                balance_after_transaction=destination_balance,
+                transaction_type=transaction_type,
+                **destination_details
+            ),
+        ])
+        write_journal(transaction_type, source_details.get('description', ''), [
+            (source, -amount, source_row),
+            (destination, amount, destination_row),
+        ])
+        record_daily_balance(source, source_balance, debit=amount)
+        record_daily_balance(destination, destination_balance, credit=amount)
+        bump_ledger_versions([source.user_id, destination.user_id])
+
+    source.balance = source_balance
+    destination.balance = destination_balance
+    publish_balance(source)
+    publish_balance(destination)
+    return source_row
+
+
+def post_transfer(source, destination, amount, description=''):
+    details = {
+        'source_account': str(source.account_no),
+        'destination_account': str(destination.account_no),
+        'description': description,
+    }
+    return move_money(
+        source,
+        destination,
+        amount,
+        transaction_type=TRANSFER,
+        source_details=details,
+        destination_details=details,
+    )
+
+
+def post_payment(payer, recipient, amount, recipient_name='', payment_method='',
+                 description=''):
+    # The payer's row names the recipient; the recipient's row does not,
+    # which is how reports tell the two sides of a payment apart.
+    return move_money(
+        payer,
+        recipient,
+        amount,
+        transaction_type=PAYMENT,
+        source_details={
+            'recipient_name': recipient_name,
+            'recipient_account': str(recipient.account_no),
+            'payment_method': payment_method,
+            'description': description,
+        },
+        destination_details={
+            'description': f'Received payment from {payer.user.first_name}',
+        },
+    )
+
+
+def refund_schedule_postings(schedules):
+    """Pay the instalments debited for ``schedules`` back to their owners'
+    accounts, one ``DEPOSIT`` row per schedule, in the caller's transaction.
+
+    ``schedules`` are locked by the caller and annotated with their owner's
+    ``account_id``. The amount refunded is what the ledger shows was
+    debited. Returns the number of schedules refunded.
+    """
+    paid_in = dict(
+        Transaction.objects
+        .filter(deposit_schedule__in=schedules, transaction_type=WITHDRAWAL)
+        .values('deposit_schedule')
+        .annotate(total=Sum('amount'))
+        .values_list('deposit_schedule', 'total')
+    )
+    refunds = [
+        (schedule, paid_in[schedule.pk])
+        for schedule in schedules
+        if paid_in.get(schedule.pk) and schedule.account_id is not None
+    ]
+    if not refunds:
+        return 0
+
+    with transaction.atomic():
+        locked = lock_accounts(*(
+            UserBankAccount(pk=schedule.account_id) for schedule, _ in refunds
+        ))
+        changes = {pk: [account.balance, 0, 0, 0] for pk, account in locked.items()}
+        ledger_rows = []
+        for schedule, amount in refunds:
+            change = changes[schedule.account_id]
+            change[0] += amount
+            change[1] += amount
+            change[3] += 1
+            label = 'FD' if schedule.fd_application_id else 'RD'
+            ledger_rows.append(Transaction(
+                account_id=schedule.account_id,
+                amount=amount,
+                balance_after_transaction=change[0],
+                transaction_type=DEPOSIT,
+                description=f'{label} instalments refunded'
+            ))
+
+        for pk, account in locked.items():
+            account.balance = changes[pk][0]
+            publish_balance(account)
+        UserBankAccount.objects.bulk_update(locked.values(), ['balance'])
+        create_ledger_rows(ledger_rows)
+        record_daily_balances(changes)
+        bump_ledger_versions(account.user_id for account in locked.values())
+    return len(ledger_rows)
+
+
+def fail_batch(batch, error):
+    # The posting rolled back, so the batch row is updated on its own.
+    batch.status = 'Failed'
+    batch.posted_at = None
+    batch.error = error
+    PaymentBatch.objects.filter(pk=batch.pk).update(
+        status=batch.status, posted_at=None, error=error
+    )
+
+
+def post_batch(batch, legs, claim=None):
+    """Post every ``(destination, amount, description)`` leg of ``batch``
+    as transfers from ``batch.account`` in a single database transaction.
+
+    ``claim`` is an unsaved ``IdempotencyKey`` for the upload; it is saved,
+    pointing at ``batch``, in the same transaction, so a retried upload
+    either finds it or raises ``IntegrityError`` instead of paying twice.
+
+    All accounts are locked once, balances are written with one
+    ``bulk_update`` and the ledger rows for both sides with one
+    ``bulk_create``. Either every leg is posted or none is; a rejected or
+    failed posting marks the batch ``Failed`` before the error propagates.
+    """
+    source = batch.account
+    total = sum((amount for _, amount, _ in legs), Decimal('0.00'))
+
+    claimed = claim is None
+    try:
+        with transaction.atomic():
+            if claim is not None:
+                claim.batch = batch
+                claim.save()
+                claimed = True
+            locked = lock_accounts(source, *(destination for destination, _, _ in legs))
+            missing = [
+                str(destination.account_no)
+                for destination, _, _ in legs
+                if destination.pk not in locked or not locked[destination.pk].user_is_active
+            ]
+            if missing:
+                raise ValidationError(
+                    f'Destination accounts do not exist or are not active: {", ".join(missing)}'
+                )
+            if source.pk in {destination.pk for destination, _, _ in legs}:
+                raise ValidationError('A batch cannot pay into its own account.')
+            check_balance(locked[source.pk], total)
+
+            changes = {pk: [account.balance, 0, 0, 0] for pk, account in locked.items()}
+            ledger_rows = []
+            journal_legs = []
+            for destination, amount, description in legs:
+                details = {
+                    'amount': amount,
+                    'transaction_type': TRANSFER,
+                    'source_account': str(source.account_no),
+                    'destination_account': str(destination.account_no),
+                    'description': description or batch.description,
+                }
+                for account, sign in ((source, -1), (destination, 1)):
+                    change = changes[account.pk]
+                    change[0] += sign * amount
+                    change[1 if sign > 0 else 2] += amount
+                    change[3] += 1
+                    ledger_row = Transaction(
+                        account=account,
+                        balance_after_transaction=change[0],
+                        **details
+                    )
+                    ledger_rows.append(ledger_row)
+                    journal_legs.append((account, sign * amount, ledger_row))
+
+            for pk, account in locked.items():
+                account.balance = changes[pk][0]
+                publish_balance(account)
+            UserBankAccount.objects.bulk_update(locked.values(), ['balance'])
+            create_ledger_rows(ledger_rows)
+            write_journal(TRANSFER, batch.description, journal_legs)
+            record_daily_balances(changes)
+            bump_ledger_versions(account.user_id for account in locked.values())
+
+            batch.status = 'Posted'
+            batch.posted_at = timezone.now()
+            batch.save(update_fields=['status', 'posted_at'])
+    except ValidationError as error:
+        fail_batch(batch, ' '.join(error.messages))
+        raise
+    except DatabaseError:
+        if not claimed:
+            # A retry of the same upload holds the key; the caller replays it.
+            fail_batch(batch, 'This upload was already submitted.')
+            raise
+        logger.exception('Payment batch %s could not be posted', batch.pk)
+        fail_batch(batch, 'The batch could not be posted. Please try again.')
+        raise
+
+    source.balance = changes[source.pk][0]
+    return ledger_rows
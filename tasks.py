@@ -1,45 +1,611 @@
+import datetime
+import logging
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+from django.db import DatabaseError, transaction
+from django.db.models import Count, Exists, Max, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
-from celery import shared_task
+from celery import chord, group, shared_task
 
-from accounts.models import UserBankAccount
-from transactions.constants import INTEREST
-from transactions.models import Transaction
+from accounts.models import BankAccountType, UserBankAccount
+from transactions.constants import DEPOSIT, INTEREST, WITHDRAWAL
+from transactions.models import (
+    DailyBalanceSnapshot,
+    DepositSchedule,
+    FDApplication,
+    IdempotencyKey,
+    InterestRun,
+    Notification,
+    RDApplication,
+    Transaction,
+)
+from transactions.events import publish, publish_balance
+from transactions.notifications import notify
+from transactions.page_cache import bump_ledger_versions
+from transactions.reports import day_start, debit_q
+from transactions.schedules import (
+    build_fd_schedules,
+    build_rd_schedules,
+    build_schedules,
+    cancel_schedules,
+    from_paise,
+)
+from transactions.services import record_daily_balances
 
+logger = logging.getLogger(__name__)
 
-@shared_task(name="calculate_interest")
-def calculate_interest():
-    accounts = UserBankAccount.objects.filter(
+INTEREST_CHUNK_SIZE = 1000
+INTEREST_SHARDS = 8
+SNAPSHOT_BATCH_SIZE = 1000
+REVIEW_CHUNK_SIZE = 500
+DEPOSIT_CHUNK_SIZE = 1000
+DEPOSIT_SHARDS = 8
+EMAIL_BATCH_SIZE = 100
+APPLICATION_MODELS = {
+    'fd': FDApplication,
+    'rd': RDApplication,
+}
+IDEMPOTENCY_KEY_TTL = getattr(
+    settings, 'IDEMPOTENCY_KEY_TTL', datetime.timedelta(hours=24)
+)
+
+
+def interest_schedule(month):
+    """Map each account type id to ``(account_type, start_months)``.
+
+    ``start_months`` are the ``interest_start_date`` months for which
+    ``month`` is one of ``UserBankAccount.get_interest_calculation_months()``,
+    so the monthly eligibility check can be pushed into SQL.
+    """
+    schedule = {}
+    for account_type in BankAccountType.objects.all():
+        interval = int(12 / account_type.interest_calculation_per_year)
+        schedule[account_type.pk] = (
+            account_type,
+            [start for start in range(1, month + 1) if (month - start) % interval == 0],
+        )
+    return schedule
+
+
+def interest_accounts(schedule, now, period):
+    due = Q()
+    for account_type_id, (_, start_months) in schedule.items():
+        if start_months:
+            due |= Q(
+                account_type_id=account_type_id,
+                interest_start_date__month__in=start_months,
+            )
+
+    if not due:
+        return UserBankAccount.objects.none()
+
+    already_credited = Transaction.objects.filter(
+        account=OuterRef('pk'),
+        interest_period=period,
+    )
+    return UserBankAccount.objects.filter(
+        due,
+        ~Exists(already_credited),
         balance__gt=0,
-        interest_start_date__gte=timezone.now(),
+        interest_start_date__gte=now,
         initial_deposit_date__isnull=False
-    ).select_related('account_type')
+    )
 
-    this_month = timezone.now().month
 
-    created_transactions = []
-    updated_accounts = []
+def credit_interest_chunk(accounts, schedule, run, chunk_size):
+    """Credit the next chunk of ``accounts`` after ``run``'s checkpoint.
 
-    for account in accounts:
-        if this_month in account.get_interest_calculation_months():
-            interest = account.account_type.calculate_interest(
-                account.balance
-            )
+    Returns the number of accounts credited; ``0`` means the run is done.
+    """
+    with transaction.atomic():
+        chunk = list(
+            accounts
+            .filter(pk__gt=run.last_account_id)
+            .order_by('pk')
+            .only('pk', 'balance', 'account_type', 'user')
+            .select_for_update()[:chunk_size]
+        )
+        if not chunk:
+            return 0
+
+        created_transactions = []
+        paid = Decimal('0.00')
+
+        for account in chunk:
+            account_type = schedule[account.account_type_id][0]
+            interest = account_type.calculate_interest(account.balance)
             account.balance += interest
-            account.save()
+            paid += interest
 
-            transaction_obj = Transaction(
+            created_transactions.append(Transaction(
                 account=account,
                 transaction_type=INTEREST,
-                amount=interest
-            )
-            created_transactions.append(transaction_obj)
-            updated_accounts.append(account)
+                amount=interest,
+                balance_after_transaction=account.balance,
+                interest_period=run.period
+            ))
 
-    if created_transactions:
+        UserBankAccount.objects.bulk_update(chunk, ['balance'])
         Transaction.objects.bulk_create(created_transactions)
+        bump_ledger_versions(account.user_id for account in chunk)
+
+        run.last_account_id = chunk[-1].pk
+        run.accounts_credited += len(chunk)
+        run.interest_paid += paid
+        run.save(update_fields=[
+            'last_account_id',
+            'accounts_credited',
+            'interest_paid'
+        ])
+
+    return len(chunk)
 
-    if updated_accounts:
-        UserBankAccount.objects.bulk_update(
-            updated_accounts, ['balance']
+
+def credit_interest(period, shard=0, after_pk=0, upto_pk=None, chunk_size=INTEREST_CHUNK_SIZE):
+    """Credit interest for ``period`` to eligible accounts with
+    ``after_pk < pk <= upto_pk``, resuming from the shard's checkpoint."""
+    run, _ = InterestRun.objects.get_or_create(
+        period=period,
+        shard=shard,
+        defaults={'last_account_id': after_pk}
+    )
+    summary = {'period': period, 'shard': shard}
+
+    if run.completed_at:
+        logger.info('Interest for %s shard %d was already credited', period, shard)
+    else:
+        month = int(period.split('-')[1])
+        schedule = interest_schedule(month)
+        accounts = interest_accounts(schedule, timezone.now(), period)
+        if upto_pk is not None:
+            accounts = accounts.filter(pk__lte=upto_pk)
+
+        started = time.monotonic()
+        credited = 0
+        while True:
+            count = credit_interest_chunk(accounts, schedule, run, chunk_size)
+            if not count:
+                break
+            credited += count
+
+        run.completed_at = timezone.now()
+        run.save(update_fields=['completed_at'])
+
+        elapsed = time.monotonic() - started
+        rate = credited / elapsed if elapsed else 0
+        logger.info(
+            'Credited interest to %d accounts for %s shard %d in %.1fs (%.0f accounts/s)',
+            credited, period, shard, elapsed, rate
         )
+        summary['accounts_per_second'] = round(rate, 1)
+
+    summary.update({
+        'accounts_credited': run.accounts_credited,
+        'interest_paid': str(run.interest_paid),
+    })
+    return summary
+
+
+@shared_task(name="calculate_interest")
+def calculate_interest(chunk_size=INTEREST_CHUNK_SIZE):
+    return credit_interest(
+        timezone.now().strftime('%Y-%m'),
+        chunk_size=chunk_size
+    )
+
+
+@shared_task(
+    name="credit_interest_shard",
+    acks_late=True,
+    autoretry_for=(DatabaseError,),
+    retry_backoff=True,
+    max_retries=5,
+)
+def credit_interest_shard(period, shard, after_pk, upto_pk, chunk_size=INTEREST_CHUNK_SIZE):
+    return credit_interest(period, shard, after_pk, upto_pk, chunk_size)
+
+
+@shared_task(name="finish_interest_run")
+def finish_interest_run(results, period):
+    accounts_credited = sum(result['accounts_credited'] for result in results)
+    interest_paid = sum(
+        (Decimal(result['interest_paid']) for result in results),
+        Decimal('0.00')
+    )
+
+    message = (
+        f'Interest for {period}: Rs.{interest_paid} credited to '
+        f'{accounts_credited} accounts across {len(results)} shards.'
+    )
+    staff = get_user_model().objects.filter(is_staff=True, is_active=True)
+    notify([Notification(user=user, message=message) for user in staff])
+
+    logger.info(message)
+    return {
+        'period': period,
+        'accounts_credited': accounts_credited,
+        'interest_paid': str(interest_paid),
+    }
+
+
+@shared_task(name="fan_out_interest")
+def fan_out_interest(shards=INTEREST_SHARDS, chunk_size=INTEREST_CHUNK_SIZE):
+    """Split eligible accounts into ``shards`` primary-key ranges and credit
+    them in parallel, reporting the totals to staff once all shards finish."""
+    now = timezone.now()
+    period = now.strftime('%Y-%m')
+    accounts = interest_accounts(interest_schedule(now.month), now, period)
+    bounds = accounts.aggregate(first=Min('pk'), last=Max('pk'))
+
+    if bounds['first'] is None:
+        logger.info('No accounts are due interest for %s', period)
+        return None
+
+    after_pk = bounds['first'] - 1
+    step = -(-(bounds['last'] - after_pk) // shards)
+    header = []
+    for shard in range(1, shards + 1):
+        upto_pk = min(after_pk + step, bounds['last'])
+        header.append(
+            credit_interest_shard.s(period, shard, after_pk, upto_pk, chunk_size)
+        )
+        if upto_pk == bounds['last']:
+            break
+        after_pk = upto_pk
+
+    return chord(header)(finish_interest_run.s(period)).id
+
+
+@shared_task(name="purge_idempotency_keys")
+def purge_idempotency_keys():
+    """Forget idempotency keys older than ``IDEMPOTENCY_KEY_TTL``."""
+    deleted, _ = IdempotencyKey.objects.filter(
+        created_at__lt=timezone.now() - IDEMPOTENCY_KEY_TTL
+    ).delete()
+    return deleted
+
+
+def snapshot_day(date):
+    """Rebuild every account's ``DailyBalanceSnapshot`` for ``date`` from the
+    ledger. Returns the number of snapshots written."""
+    day = Transaction.objects.filter(
+        timestamp__gte=day_start(date),
+        timestamp__lt=day_start(date + datetime.timedelta(days=1))
+    )
+    closing_balance = (
+        day.filter(account=OuterRef('account'))
+        .order_by('-timestamp', '-pk')
+        .values('balance_after_transaction')[:1]
+    )
+    debits = debit_q()
+    rows = (
+        day.order_by()
+        .values('account')
+        .annotate(
+            count=Count('pk'),
+            credits=Sum('amount', filter=~debits),
+            debits=Sum('amount', filter=debits),
+            closing_balance=Subquery(closing_balance),
+        )
+        .iterator(chunk_size=SNAPSHOT_BATCH_SIZE)
+    )
+
+    written = 0
+    batch = []
+    for row in rows:
+        batch.append(DailyBalanceSnapshot(
+            account_id=row['account'],
+            date=date,
+            closing_balance=row['closing_balance'],
+            credits=row['credits'] or 0,
+            debits=row['debits'] or 0,
+            transaction_count=row['count']
+        ))
+        if len(batch) >= SNAPSHOT_BATCH_SIZE:
+            written += len(save_snapshots(batch))
+            batch = []
+    if batch:
+        written += len(save_snapshots(batch))
+
+    return written
+
+
+def save_snapshots(snapshots):
+    return DailyBalanceSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=['account', 'date'],
+        update_fields=['closing_balance', 'credits', 'debits', 'transaction_count']
+    )
+
+
+@shared_task(name="snapshot_daily_balances")
+def snapshot_daily_balances(days=1):
+    """Nightly backfill of the last ``days`` days of balance snapshots.
+
+    Postings keep today's snapshot current as they happen; this rebuilds
+    past days from the ledger so bulk postings such as interest are
+    reflected too.
+    """
+    today = timezone.localdate()
+    written = 0
+    for offset in range(days, 0, -1):
+        written += snapshot_day(today - datetime.timedelta(days=offset))
+
+    logger.info('Wrote %d daily balance snapshots', written)
+    return written
+
+
+def send_emails(messages):
+    """Send ``messages`` in batches over one pooled SMTP connection."""
+    if not messages:
+        return 0
+
+    sent = 0
+    with get_connection() as connection:
+        for start in range(0, len(messages), EMAIL_BATCH_SIZE):
+            sent += connection.send_messages(
+                messages[start:start + EMAIL_BATCH_SIZE]
+            ) or 0
+    return sent
+
+
+@shared_task(name="review_applications")
+def review_applications(kind, application_ids, status):
+    """Set ``status`` on FD (``kind='fd'``) or RD (``kind='rd'``)
+    applications and tell their owners, by notification and email.
+
+    Shared by the admin bulk actions and the per-item approve/reject views.
+    Applications already in ``status`` are skipped, so a retried or
+    repeated request does not notify twice.
+    """
+    model = APPLICATION_MODELS[kind]
+    label = kind.upper()
+    reviewed = 0
+
+    for start in range(0, len(application_ids), REVIEW_CHUNK_SIZE):
+        chunk_ids = application_ids[start:start + REVIEW_CHUNK_SIZE]
+        with transaction.atomic():
+            applications = list(
+                model.objects
+                .filter(pk__in=chunk_ids)
+                .exclude(status=status)
+                .select_related('user')
+                .select_for_update(of=('self',))
+            )
+            if not applications:
+                continue
+
+            reviewed_ids = [application.pk for application in applications]
+            model.objects.filter(pk__in=reviewed_ids).update(
+                status=status, reviewed_at=timezone.now()
+            )
+            if status == 'Approved':
+                build_schedules(model, reviewed_ids)
+            else:
+                _, refunded = cancel_schedules(model, reviewed_ids)
+                if refunded:
+                    logger.info(
+                        'Refunded the posted instalments of %d %s schedules',
+                        refunded, label
+                    )
+            bump_ledger_versions(application.user_id for application in applications)
+
+            notifications = []
+            emails = []
+            for application in applications:
+                publish(application.user_id, 'application', {
+                    'kind': kind,
+                    'id': application.pk,
+                    'status': status,
+                })
+                message = (
+                    f'Your {label} application for Rs.{application.amount} '
+                    f'has been {status.lower()}.'
+                )
+                notifications.append(
+                    Notification(user=application.user, message=message)
+                )
+                if application.user.email:
+                    emails.append(EmailMessage(
+                        subject=f'{label} application {status.lower()}',
+                        body=message,
+                        to=[application.user.email],
+                    ))
+            notify(notifications)
+
+        reviewed += len(applications)
+        send_emails(emails)
+
+    logger.info('Marked %d %s applications as %s', reviewed, label, status)
+    return reviewed
+
+
+@shared_task(name="build_deposit_schedules")
+def build_deposit_schedules():
+    """Backfill schedules for approved deposits that don't have one, such as
+    those approved before schedules were precomputed."""
+    built = build_fd_schedules() + build_rd_schedules()
+    logger.info('Built %d deposit schedules', built)
+    return built
+
+
+def post_deposit_chunk(schedules, today, chunk_size):
+    """Post every instalment and maturity due by ``today`` for the next
+    chunk of ``schedules``, advancing each schedule's ``next_due_date`` in
+    the same database transaction as its ledger rows.
+
+    Schedules another worker holds are skipped rather than waited for. An
+    instalment the account cannot cover stays due and is retried by the
+    next run; once it is paid, the rest of the schedule is moved back by
+    the delay. Returns ``(last_pk, posted, unpaid)``, or ``None`` when no
+    schedules are left.
+    """
+    with transaction.atomic():
+        chunk = list(
+            schedules
+            .annotate(
+                account_id=Coalesce('fd_application__user__account', 'rd_application__user__account'),
+                user_id=Coalesce('fd_application__user', 'rd_application__user'),
+            )
+            .order_by('pk')
+            .select_for_update(skip_locked=True, of=('self',))[:chunk_size]
+        )
+        if not chunk:
+            return None
+
+        accounts = {
+            account.pk: account
+            for account in UserBankAccount.objects
+            .select_for_update()
+            .filter(pk__in={schedule.account_id for schedule in chunk})
+            .order_by('pk')
+        }
+        changes = {pk: [account.balance, 0, 0, 0] for pk, account in accounts.items()}
+        ledger_rows = []
+        notifications = []
+        rescheduled = []
+        posted = unpaid = 0
+
+        for schedule in chunk:
+            change = changes.get(schedule.account_id)
+            if change is None:
+                unpaid += 1
+                continue
+
+            label = 'FD' if schedule.fd_application_id else 'RD'
+            while schedule.next_due_date is not None and schedule.next_due_date <= today:
+                event, paise = schedule.next_event()
+                amount = from_paise(paise)
+                if event == DepositSchedule.MATURITY_EVENT:
+                    transaction_type = DEPOSIT
+                    description = f'{label} maturity'
+                    change[0] += amount
+                    change[1] += amount
+                else:
+                    if amount > change[0]:
+                        unpaid += 1
+                        break
+                    transaction_type = WITHDRAWAL
+                    description = f'{label} instalment {event} of {schedule.instalment_count}'
+                    change[0] -= amount
+                    change[2] += amount
+                change[3] += 1
+
+                ledger_rows.append(Transaction(
+                    account_id=schedule.account_id,
+                    amount=amount,
+                    balance_after_transaction=change[0],
+                    transaction_type=transaction_type,
+                    description=description,
+                    deposit_schedule=schedule,
+                    schedule_event=event
+                ))
+                if event == DepositSchedule.MATURITY_EVENT:
+                    notifications.append(Notification(
+                        user_id=schedule.user_id,
+                        message=f'Your {label} has matured: Rs.{amount} was credited to your account.'
+                    ))
+                if schedule.advance(today):
+                    rescheduled.append(schedule)
+                posted += 1
+
+        changes = {pk: change for pk, change in changes.items() if change[3]}
+        for pk in changes:
+            accounts[pk].balance = changes[pk][0]
+            publish_balance(accounts[pk])
+
+        DepositSchedule.objects.bulk_update(chunk, ['instalments_posted', 'next_due_date'])
+        DepositSchedule.objects.bulk_update(rescheduled, ['start_date', 'maturity_date', 'rows'])
+        UserBankAccount.objects.bulk_update([accounts[pk] for pk in changes], ['balance'])
+        Transaction.objects.bulk_create(ledger_rows)
+        record_daily_balances(changes)
+        bump_ledger_versions(accounts[pk].user_id for pk in changes)
+        notify(notifications)
+
+    return chunk[-1].pk, posted, unpaid
+
+
+def due_schedules(today):
+    """Schedules with a posting due by ``today`` whose application is
+    still approved."""
+    return DepositSchedule.objects.filter(
+        Q(fd_application__status='Approved') | Q(rd_application__status='Approved'),
+        next_due_date__lte=today,
+    )
+
+
+def post_due_deposits(today, after_pk=0, upto_pk=None, chunk_size=DEPOSIT_CHUNK_SIZE):
+    """Post instalments and maturities due by ``today`` for schedules with
+    ``after_pk < pk <= upto_pk``.
+
+    There is no checkpoint to keep: a posted event moves its schedule's
+    ``next_due_date`` on, so a retried or repeated run only finds what is
+    still due.
+    """
+    schedules = due_schedules(today)
+    if upto_pk is not None:
+        schedules = schedules.filter(pk__lte=upto_pk)
+
+    started = time.monotonic()
+    posted = unpaid = 0
+    while True:
+        result = post_deposit_chunk(schedules.filter(pk__gt=after_pk), today, chunk_size)
+        if result is None:
+            break
+        after_pk, chunk_posted, chunk_unpaid = result
+        posted += chunk_posted
+        unpaid += chunk_unpaid
+
+    elapsed = time.monotonic() - started
+    logger.info(
+        'Posted %d deposit instalments and maturities due by %s in %.1fs; %d left unpaid',
+        posted, today, elapsed, unpaid
+    )
+    return {'date': today.isoformat(), 'posted': posted, 'unpaid': unpaid}
+
+
+@shared_task(
+    name="post_deposit_shard",
+    acks_late=True,
+    autoretry_for=(DatabaseError,),
+    retry_backoff=True,
+    max_retries=5,
+)
+def post_deposit_shard(today, after_pk, upto_pk, chunk_size=DEPOSIT_CHUNK_SIZE):
+    return post_due_deposits(
+        datetime.date.fromisoformat(today), after_pk, upto_pk, chunk_size
+    )
+
+
+@shared_task(name="post_due_deposits")
+def fan_out_deposit_postings(shards=DEPOSIT_SHARDS, chunk_size=DEPOSIT_CHUNK_SIZE):
+    """Split the schedules due today into ``shards`` primary-key ranges and
+    post them in parallel. Run daily by django-celery-beat."""
+    today = timezone.localdate()
+    bounds = due_schedules(today).aggregate(
+        first=Min('pk'), last=Max('pk')
+    )
+    if bounds['first'] is None:
+        logger.info('No deposit instalments or maturities are due on %s', today)
+        return None
+
+    after_pk = bounds['first'] - 1
+    step = -(-(bounds['last'] - after_pk) // shards)
+    shard_tasks = []
+    for _ in range(shards):
+        upto_pk = min(after_pk + step, bounds['last'])
+        shard_tasks.append(
+            post_deposit_shard.s(today.isoformat(), after_pk, upto_pk, chunk_size)
+        )
+        if upto_pk == bounds['last']:
+            break
+        after_pk = upto_pk
+
+    return group(shard_tasks)().id
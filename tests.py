@@ -1,3 +1,974 @@
-from django.test import TestCase
+import datetime
+import time
+import uuid
+from decimal import Decimal
+from unittest import SkipTest, mock
 
-# Create your tests here.
+import redis
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from accounts.models import BankAccountType, UserBankAccount
+from transactions import velocity
+from transactions.constants import (
+    DEPOSIT,
+    INTEREST,
+    PAYMENT,
+    TRANSFER,
+    WITHDRAWAL,
+)
+from transactions.models import (
+    DepositSchedule,
+    FDApplication,
+    IdempotencyKey,
+    InterestRun,
+    JournalEntry,
+    JournalLeg,
+    PaymentBatch,
+    RDApplication,
+    Transaction,
+)
+from transactions.pagination import decode_cursor, encode_cursor, paginate_keyset
+from transactions.profiling import ProfilingMiddleware
+from transactions.reports import debit_q, parse_daterange, preset_dates, summarize
+from transactions.schedules import (
+    accrual_rows,
+    build_schedules,
+    cancel_schedules,
+    first_due,
+    from_paise,
+    to_paise,
+)
+from transactions.search import search_queryset, search_transactions
+from transactions.services import (
+    check_balance,
+    lock_accounts,
+    move_money,
+    post_batch,
+    post_transfer,
+)
+from transactions.tasks import (
+    credit_interest,
+    due_schedules,
+    interest_accounts,
+    interest_schedule,
+    post_deposit_chunk,
+)
+
+
+class AccountsMixin:
+    """Creates an account type and bank accounts with opening balances."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.account_type = BankAccountType.objects.create(
+            name='Savings',
+            maximum_withdrawal_amount=Decimal('100000.00'),
+            annual_interest_rate=Decimal('4.00'),
+            interest_calculation_per_year=4,
+        )
+
+    @classmethod
+    def create_account(cls, account_no, balance, is_active=True):
+        User = get_user_model()
+        email = f'user{account_no}@example.com'
+        user = User(email=email, first_name='Test', is_active=is_active)
+        setattr(user, User.USERNAME_FIELD, email)
+        user.set_password('password')
+        user.save()
+        return UserBankAccount.objects.create(
+            user=user,
+            account_type=cls.account_type,
+            account_no=account_no,
+            balance=Decimal(balance),
+        )
+
+
+class MoveMoneyTests(AccountsMixin, TestCase):
+
+    def setUp(self):
+        self.source = self.create_account(1001, '500.00')
+        self.destination = self.create_account(1002, '100.00')
+
+    def test_moves_balance_and_writes_both_ledger_rows(self):
+        row = post_transfer(self.source, self.destination, Decimal('200.00'), 'Rent')
+
+        self.source.refresh_from_db()
+        self.destination.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal('300.00'))
+        self.assertEqual(self.destination.balance, Decimal('300.00'))
+        self.assertEqual(row.account_id, self.source.pk)
+        self.assertEqual(row.balance_after_transaction, Decimal('300.00'))
+        destination_row = Transaction.objects.get(account=self.destination)
+        self.assertEqual(destination_row.transaction_type, TRANSFER)
+        self.assertEqual(destination_row.balance_after_transaction, Decimal('300.00'))
+
+    def test_journal_legs_sum_to_zero(self):
+        post_transfer(self.source, self.destination, Decimal('200.00'))
+
+        legs = JournalLeg.objects.order_by('amount')
+        self.assertEqual(
+            [(leg.account_id, leg.amount) for leg in legs],
+            [(self.source.pk, Decimal('-200.00')), (self.destination.pk, Decimal('200.00'))],
+        )
+        self.assertTrue(all(leg.transaction_id for leg in legs))
+
+    def test_deleting_an_account_deletes_its_journal_entries(self):
+        post_transfer(self.source, self.destination, Decimal('200.00'))
+
+        self.source.delete()
+
+        self.assertFalse(JournalEntry.objects.exists())
+        self.assertFalse(JournalLeg.objects.exists())
+        # The counterparty keeps its ledger row.
+        self.assertTrue(Transaction.objects.filter(account=self.destination).exists())
+
+    def test_rechecks_balance_on_locked_row(self):
+        # The instance passed in still shows the balance the form saw.
+        UserBankAccount.objects.filter(pk=self.source.pk).update(balance=Decimal('50.00'))
+
+        with self.assertRaises(ValidationError):
+            post_transfer(self.source, self.destination, Decimal('200.00'))
+
+        self.destination.refresh_from_db()
+        self.assertEqual(self.destination.balance, Decimal('100.00'))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_rejects_inactive_recipient(self):
+        inactive = self.create_account(1003, '0.00', is_active=False)
+
+        with self.assertRaises(ValidationError):
+            post_transfer(self.source, inactive, Decimal('10.00'))
+
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal('500.00'))
+
+    def test_rejects_same_account(self):
+        with self.assertRaises(ValidationError):
+            move_money(self.source, self.source, Decimal('10.00'), TRANSFER, {}, {})
+
+
+class LockAccountsTests(AccountsMixin, TestCase):
+
+    def test_locks_in_primary_key_order(self):
+        first = self.create_account(2001, '1.00')
+        second = self.create_account(2002, '2.00')
+
+        locked = lock_accounts(second, first, second)
+
+        self.assertEqual(list(locked), sorted([first.pk, second.pk]))
+        self.assertEqual(locked[second.pk].balance, Decimal('2.00'))
+        self.assertTrue(locked[first.pk].user_is_active)
+
+    def test_check_balance(self):
+        account = self.create_account(2003, '10.00')
+
+        check_balance(account, Decimal('10.00'))
+        with self.assertRaises(ValidationError):
+            check_balance(account, Decimal('10.01'))
+
+
+class PostBatchTests(AccountsMixin, TestCase):
+
+    def setUp(self):
+        self.source = self.create_account(3001, '1000.00')
+        self.first = self.create_account(3002, '0.00')
+        self.second = self.create_account(3003, '0.00')
+
+    def create_batch(self, legs):
+        return PaymentBatch.objects.create(
+            account=self.source,
+            description='Payroll',
+            item_count=len(legs),
+            total_amount=sum(amount for _, amount, _ in legs),
+        )
+
+    def test_posts_every_leg(self):
+        legs = [
+            (self.first, Decimal('300.00'), ''),
+            (self.second, Decimal('200.00'), 'Bonus'),
+            (self.first, Decimal('100.00'), ''),
+        ]
+        batch = self.create_batch(legs)
+
+        post_batch(batch, legs)
+
+        balances = dict(UserBankAccount.objects.values_list('pk', 'balance'))
+        self.assertEqual(balances[self.source.pk], Decimal('400.00'))
+        self.assertEqual(balances[self.first.pk], Decimal('400.00'))
+        self.assertEqual(balances[self.second.pk], Decimal('200.00'))
+        self.assertEqual(Transaction.objects.count(), 6)
+        # Running balances follow the legs in order on the source account.
+        self.assertEqual(
+            list(
+                Transaction.objects.filter(account=self.source)
+                .order_by('pk')
+                .values_list('balance_after_transaction', flat=True)
+            ),
+            [Decimal('700.00'), Decimal('500.00'), Decimal('400.00')],
+        )
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, 'Posted')
+
+    def test_over_balance_posts_nothing_and_fails_batch(self):
+        legs = [
+            (self.first, Decimal('600.00'), ''),
+            (self.second, Decimal('600.00'), ''),
+        ]
+        batch = self.create_batch(legs)
+
+        with self.assertRaises(ValidationError):
+            post_batch(batch, legs)
+
+        self.assertFalse(Transaction.objects.exists())
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal('1000.00'))
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, 'Failed')
+        self.assertTrue(batch.error)
+
+    def test_database_error_fails_batch(self):
+        legs = [(self.first, Decimal('10.00'), '')]
+        batch = self.create_batch(legs)
+
+        with mock.patch(
+            'transactions.services.write_journal', side_effect=DatabaseError
+        ), self.assertRaises(DatabaseError):
+            post_batch(batch, legs)
+
+        self.assertFalse(Transaction.objects.exists())
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, 'Failed')
+
+
+@mock.patch('transactions.views.check_rate_limit', return_value='velocity:rate:test')
+class IdempotencyTests(AccountsMixin, TestCase):
+
+    def setUp(self):
+        self.account = self.create_account(4001, '0.00')
+        self.client.force_login(self.account.user)
+        self.url = reverse('transactions:deposit_money')
+        self.amount = settings.MINIMUM_DEPOSIT_AMOUNT + 1
+        self.key = uuid.uuid4().hex
+
+    def deposit(self, amount=None, key=None):
+        return self.client.post(self.url, {
+            'amount': amount or self.amount,
+            'transaction_type': DEPOSIT,
+            'idempotency_key': key or self.key,
+        })
+
+    def test_retry_replays_the_first_posting(self, check_rate_limit):
+        first = self.deposit()
+        with mock.patch('transactions.views.refund_rate_limit') as refund:
+            second = self.deposit()
+
+        self.assertEqual(first.status_code, 302)
+        self.assertEqual(second.status_code, 302)
+        self.assertEqual(Transaction.objects.filter(account=self.account).count(), 1)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, self.amount)
+        claim = IdempotencyKey.objects.get(key=self.key)
+        self.assertEqual(claim.transaction, Transaction.objects.get())
+        refund.assert_called_once_with('velocity:rate:test')
+
+    def test_key_reused_for_a_different_request_is_refused(self, check_rate_limit):
+        self.deposit()
+        response = self.deposit(amount=self.amount + 1)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_new_key_posts_again(self, check_rate_limit):
+        self.deposit()
+        self.deposit(key=uuid.uuid4().hex)
+
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 2)
+
+    def test_rejected_posting_releases_the_key(self, check_rate_limit):
+        with mock.patch(
+            'transactions.views.DepositMoneyView.post_transaction',
+            side_effect=ValidationError('Rejected')
+        ):
+            response = self.deposit()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.deposit().status_code, 302)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+
+@mock.patch('transactions.views.reserve_outflow', return_value=None)
+@mock.patch('transactions.views.check_rate_limit', return_value=None)
+class BatchIdempotencyTests(AccountsMixin, TestCase):
+
+    def setUp(self):
+        self.source = self.create_account(4101, '1000.00')
+        self.destination = self.create_account(4102, '0.00')
+        self.client.force_login(self.source.user)
+        self.url = reverse('transactions:batch_payment_form')
+        self.key = uuid.uuid4().hex
+
+    def upload(self, amount='250.00'):
+        return self.client.post(self.url, {
+            'payments': f'[{{"destination_account": "4102", "amount": "{amount}"}}]',
+            'description': 'Payroll',
+            'idempotency_key': self.key,
+        })
+
+    def test_retry_redirects_to_the_first_batch(self, check_rate_limit, reserve_outflow):
+        first = self.upload()
+        second = self.upload()
+
+        batch = PaymentBatch.objects.get()
+        self.assertEqual(first.status_code, 302)
+        self.assertRedirects(
+            second,
+            reverse('transactions:payment_batch_status', args=[batch.pk]),
+            fetch_redirect_response=False
+        )
+        self.destination.refresh_from_db()
+        self.assertEqual(self.destination.balance, Decimal('250.00'))
+        self.assertEqual(IdempotencyKey.objects.get(key=self.key).batch, batch)
+
+    def test_key_reused_for_a_different_upload_is_refused(self, check_rate_limit, reserve_outflow):
+        self.upload()
+        response = self.upload(amount='100.00')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(PaymentBatch.objects.count(), 1)
+
+
+class BatchLimitTests(AccountsMixin, TestCase):
+
+    def setUp(self):
+        self.source = self.create_account(4201, '1000.00')
+        self.destination = self.create_account(4202, '0.00')
+        self.client.force_login(self.source.user)
+
+    def upload(self):
+        return self.client.post(reverse('transactions:batch_payment_form'), {
+            'payments': '[{"destination_account": "4202", "amount": "250.00"}]',
+        })
+
+    def test_rate_limited_upload_is_refused(self):
+        with mock.patch(
+            'transactions.views.check_rate_limit',
+            side_effect=ValidationError('Too many requests.')
+        ):
+            response = self.upload()
+
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(PaymentBatch.objects.exists())
+
+    def test_batch_total_is_reserved_against_the_outflow_limit(self):
+        with mock.patch('transactions.views.check_rate_limit', return_value=None), \
+                mock.patch('transactions.views.reserve_outflow') as reserve:
+            self.upload()
+
+        reserve.assert_called_once_with(self.source.pk, Decimal('250.00'))
+
+    def test_failed_posting_releases_the_reservation(self):
+        with mock.patch('transactions.views.check_rate_limit', return_value=None), \
+                mock.patch('transactions.views.reserve_outflow', return_value='reservation'), \
+                mock.patch('transactions.views.release_outflow') as release, \
+                mock.patch(
+                    'transactions.views.post_batch',
+                    side_effect=ValidationError('Insufficient balance.')
+                ):
+            response = self.upload()
+
+        self.assertEqual(response.status_code, 200)
+        release.assert_called_once_with('reservation')
+
+    def test_posted_batch_keeps_the_reservation(self):
+        with mock.patch('transactions.views.check_rate_limit', return_value=None), \
+                mock.patch('transactions.views.reserve_outflow', return_value='reservation'), \
+                mock.patch('transactions.views.release_outflow') as release:
+            response = self.upload()
+
+        self.assertEqual(response.status_code, 302)
+        release.assert_not_called()
+
+
+class VelocityScriptTests(SimpleTestCase):
+    """Runs the Lua scripts against the Redis at ``VELOCITY_REDIS_URL``;
+    skipped when it is not reachable."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            velocity.get_client().ping()
+        except redis.RedisError:
+            raise SkipTest('Redis is not available')
+
+    def setUp(self):
+        # Fresh ids, so runs never see each other's counters.
+        self.user_id = self.account_id = f'test-{uuid.uuid4().hex}'
+        self.addCleanup(self.clear)
+
+    def clear(self):
+        client = velocity.get_client()
+        keys = list(client.scan_iter(f'velocity:*:{self.user_id}*'))
+        if keys:
+            client.delete(*keys)
+
+    @override_settings(MONEY_MOVEMENT_RATE_LIMIT=2, MONEY_MOVEMENT_RATE_WINDOW=3600)
+    def test_rate_limit_counts_requests_in_the_window(self):
+        velocity.check_rate_limit(self.user_id)
+        counter = velocity.check_rate_limit(self.user_id)
+
+        with self.assertRaises(ValidationError):
+            velocity.check_rate_limit(self.user_id)
+        velocity.refund_rate_limit(counter)
+        self.assertEqual(velocity.check_rate_limit(self.user_id), counter)
+
+    def test_refund_does_not_create_or_underflow_the_counter(self):
+        counter = f'velocity:rate:{self.user_id}:0'
+
+        velocity.refund_rate_limit(counter)
+
+        self.assertIsNone(velocity.get_client().get(counter))
+
+    @override_settings(DAILY_OUTFLOW_LIMIT='1000')
+    def test_outflow_is_reserved_up_to_the_limit(self):
+        reservation = velocity.reserve_outflow(self.account_id, Decimal('600.00'))
+
+        with self.assertRaises(ValidationError):
+            velocity.reserve_outflow(self.account_id, Decimal('500.00'))
+        velocity.release_outflow(reservation)
+        self.assertIsNotNone(velocity.reserve_outflow(self.account_id, Decimal('1000.00')))
+
+    @override_settings(DAILY_OUTFLOW_LIMIT='1000')
+    def test_expired_outflow_buckets_are_dropped(self):
+        key = velocity.outflow_key(self.account_id)
+        bucket = int(time.time()) // velocity.OUTFLOW_BUCKET_SECONDS
+        client = velocity.get_client()
+        client.hset(key, bucket - velocity.OUTFLOW_BUCKETS, 100000)
+
+        velocity.reserve_outflow(self.account_id, Decimal('1000.00'))
+
+        self.assertFalse(client.hexists(key, bucket - velocity.OUTFLOW_BUCKETS))
+
+
+class ReportSummaryTests(AccountsMixin, TestCase):
+
+    def setUp(self):
+        self.account = self.create_account(5001, '0.00')
+        self.other = self.create_account(5002, '0.00')
+        rows = [
+            (DEPOSIT, '100.00', {}),
+            (WITHDRAWAL, '30.00', {}),
+            (TRANSFER, '20.00', {'source_account': '5001', 'destination_account': '5002'}),
+            (TRANSFER, '15.00', {'source_account': '5002', 'destination_account': '5001'}),
+            (PAYMENT, '10.00', {'recipient_account': '5002'}),
+            (PAYMENT, '5.00', {}),
+            (INTEREST, '2.00', {}),
+        ]
+        self.rows = [
+            Transaction.objects.create(
+                account=self.account,
+                amount=Decimal(amount),
+                balance_after_transaction=Decimal('0.00'),
+                transaction_type=transaction_type,
+                **details
+            )
+            for transaction_type, amount, details in rows
+        ]
+        # The receiving side of the transfer out, a credit for ``other``.
+        Transaction.objects.create(
+            account=self.other,
+            amount=Decimal('20.00'),
+            balance_after_transaction=Decimal('20.00'),
+            transaction_type=TRANSFER,
+            source_account='5001',
+            destination_account='5002',
+        )
+
+    def test_debit_q_picks_the_sending_side(self):
+        debits = Transaction.objects.filter(debit_q(self.account), account=self.account)
+
+        self.assertEqual(
+            sorted(debits.values_list('pk', flat=True)),
+            [self.rows[1].pk, self.rows[2].pk, self.rows[4].pk],
+        )
+
+    def test_debit_q_without_account_compares_each_rows_own_account(self):
+        debits = Transaction.objects.filter(debit_q())
+
+        self.assertEqual(
+            sorted(debits.values_list('pk', flat=True)),
+            [self.rows[1].pk, self.rows[2].pk, self.rows[4].pk],
+        )
+
+    def test_summarize_totals_and_counts(self):
+        summary = summarize(Transaction.objects.filter(account=self.account), self.account)
+
+        self.assertEqual(summary['count'], 7)
+        self.assertEqual(summary['credits'], Decimal('122.00'))
+        self.assertEqual(summary['debits'], Decimal('60.00'))
+        self.assertEqual(summary['net'], Decimal('62.00'))
+        by_type = {row['transaction_type']: row for row in summary['by_type']}
+        self.assertEqual(by_type[TRANSFER]['count'], 2)
+        self.assertEqual(by_type[TRANSFER]['credits'], Decimal('15.00'))
+        self.assertEqual(by_type[TRANSFER]['debits'], Decimal('20.00'))
+        self.assertEqual(by_type[PAYMENT]['debits'], Decimal('10.00'))
+
+    def test_summarize_empty_queryset(self):
+        summary = summarize(Transaction.objects.none(), self.account)
+
+        self.assertEqual(summary['count'], 0)
+        self.assertEqual(summary['net'], Decimal('0.00'))
+        self.assertEqual(summary['by_type'], [])
+
+
+class SearchTotalsTests(AccountsMixin, TestCase):
+
+    def setUp(self):
+        self.account = self.create_account(5201, '0.00')
+        other = self.create_account(5202, '0.00')
+        for account, amount, description in (
+            (self.account, '100.00', 'Rent October'),
+            (self.account, '200.00', 'Rent November'),
+            (self.account, '50.00', 'Groceries'),
+            (other, '400.00', 'Rent'),
+        ):
+            Transaction.objects.create(
+                account=account,
+                amount=Decimal(amount),
+                balance_after_transaction=Decimal('0.00'),
+                transaction_type=DEPOSIT,
+                description=description,
+            )
+
+    def test_totals_cover_every_match_and_nothing_else(self):
+        rows, _ = search_transactions(self.account, 'rent', page_size=1)
+        summary = summarize(search_queryset(self.account, 'rent'), self.account)
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(summary['count'], 2)
+        self.assertEqual(summary['credits'], Decimal('300.00'))
+
+    def test_short_account_number_matches_nothing(self):
+        self.assertFalse(search_queryset(self.account, '52').exists())
+
+
+class DateRangeTests(SimpleTestCase):
+
+    def test_parse_daterange(self):
+        start, end = datetime.date(2026, 1, 1), datetime.date(2026, 1, 31)
+        cases = {
+            '2026-01-01 - 2026-01-31': (start, end),
+            ' 2026-01-01-2026-01-31 ': (start, end),
+            '2026-01-01 -': (start, None),
+            '- 2026-01-31': (None, end),
+            '2026-01-01': (start, None),
+        }
+        for value, expected in cases.items():
+            with self.subTest(value=value):
+                self.assertEqual(parse_daterange(value), expected)
+
+    def test_parse_daterange_rejects_invalid_ranges(self):
+        for value in ('', ' - ', 'last week', '2026-13-01', '01-01-2026 - 31-01-2026'):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_daterange(value)
+
+    def test_preset_dates(self):
+        today = datetime.date(2026, 10, 18)
+        cases = {
+            'last_7_days': datetime.date(2026, 10, 12),
+            'last_30_days': datetime.date(2026, 9, 19),
+            'last_90_days': datetime.date(2026, 7, 21),
+            'this_month': datetime.date(2026, 10, 1),
+        }
+        for preset, start in cases.items():
+            with self.subTest(preset=preset):
+                self.assertEqual(preset_dates(preset, today), (start, today))
+
+    @mock.patch('transactions.reports.FINANCIAL_YEAR_START_MONTH', 4)
+    def test_financial_year_starts_in_the_previous_year_before_april(self):
+        preset_dates.cache_clear()
+        self.addCleanup(preset_dates.cache_clear)
+
+        self.assertEqual(
+            preset_dates('this_fy', datetime.date(2026, 10, 18)),
+            (datetime.date(2026, 4, 1), datetime.date(2026, 10, 18))
+        )
+        self.assertEqual(
+            preset_dates('this_fy', datetime.date(2026, 2, 10)),
+            (datetime.date(2025, 4, 1), datetime.date(2026, 2, 10))
+        )
+
+    def test_unknown_preset_is_rejected(self):
+        with self.assertRaises(ValueError):
+            preset_dates('last_year', datetime.date(2026, 10, 18))
+
+
+class CursorTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        value = timezone.make_aware(datetime.datetime(2026, 3, 1, 12, 30, 15, 250000))
+
+        self.assertEqual(decode_cursor(encode_cursor(value, 42)), (value, 42))
+
+    def test_cursor_is_url_safe_and_unpadded(self):
+        cursor = encode_cursor(datetime.datetime(2026, 3, 1), 7)
+
+        self.assertNotIn('=', cursor)
+        self.assertRegex(cursor, r'^[A-Za-z0-9_-]+$')
+
+    def test_invalid_cursor_is_not_found(self):
+        for cursor in ('', 'not-a-cursor', encode_cursor(datetime.datetime(2026, 3, 1), 7)[:-3]):
+            with self.assertRaises(Http404):
+                decode_cursor(cursor)
+
+
+class KeysetPaginationTests(AccountsMixin, TestCase):
+
+    def test_pages_cover_every_row_once_across_equal_timestamps(self):
+        account = self.create_account(5101, '0.00')
+        Transaction.objects.bulk_create([
+            Transaction(
+                account=account,
+                amount=Decimal('1.00'),
+                balance_after_transaction=Decimal('0.00'),
+                transaction_type=DEPOSIT,
+            )
+            for _ in range(7)
+        ])
+        # Ties on the timestamp are broken by the primary key.
+        Transaction.objects.update(timestamp=timezone.now())
+        queryset = Transaction.objects.filter(account=account)
+
+        seen, cursor = [], None
+        while True:
+            page = paginate_keyset(queryset, cursor, 3)
+            seen += [row.pk for row in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+
+        self.assertEqual(seen, sorted(queryset.values_list('pk', flat=True)))
+
+
+class InterestTests(AccountsMixin, TestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.period = self.now.strftime('%Y-%m')
+
+    def create_saver(self, account_no, balance='1000.00', months_ahead=0, deposited=True):
+        account = self.create_account(account_no, balance)
+        # Interest is credited in the months matching interest_start_date's
+        # month, while that date is still ahead.
+        account.interest_start_date = self.now + relativedelta(years=1, months=months_ahead)
+        account.initial_deposit_date = self.now if deposited else None
+        account.save()
+        return account
+
+    def test_schedule_lists_start_months_due_this_month(self):
+        # Four credits a year: every third month from the start month.
+        schedule = interest_schedule(7)
+        self.assertEqual(schedule[self.account_type.pk][1], [1, 4, 7])
+        self.assertEqual(interest_schedule(2)[self.account_type.pk][1], [2])
+
+    def test_eligible_accounts(self):
+        due = self.create_saver(6001)
+        self.create_saver(6002, balance='0.00')
+        self.create_saver(6003, deposited=False)
+        if self.now.month < 12:
+            self.create_saver(6004, months_ahead=1)
+
+        accounts = interest_accounts(interest_schedule(self.now.month), self.now, self.period)
+
+        self.assertEqual(list(accounts.values_list('pk', flat=True)), [due.pk])
+
+    def test_credits_each_account_once_per_period(self):
+        first = self.create_saver(6101)
+        second = self.create_saver(6102, balance='250.00')
+
+        summary = credit_interest(self.period, chunk_size=1)
+        credit_interest(self.period, chunk_size=1)
+
+        for account, balance in ((first, Decimal('1000.00')), (second, Decimal('250.00'))):
+            interest = self.account_type.calculate_interest(balance)
+            row = Transaction.objects.get(account=account)
+            self.assertEqual(row.transaction_type, INTEREST)
+            self.assertEqual(row.amount, interest)
+            self.assertEqual(row.balance_after_transaction, balance + interest)
+            self.assertEqual(row.interest_period, self.period)
+            account.refresh_from_db()
+            self.assertEqual(account.balance, balance + interest)
+
+        run = InterestRun.objects.get(period=self.period, shard=0)
+        self.assertEqual(run.accounts_credited, 2)
+        self.assertEqual(run.last_account_id, second.pk)
+        self.assertIsNotNone(run.completed_at)
+        self.assertEqual(summary['accounts_credited'], 2)
+
+    def test_already_credited_account_is_skipped_by_a_new_shard(self):
+        account = self.create_saver(6201)
+        credit_interest(self.period)
+
+        # Another shard of the same period must not credit it again.
+        credit_interest(self.period, shard=1)
+
+        self.assertEqual(Transaction.objects.filter(account=account).count(), 1)
+
+
+class AccrualRowsTests(SimpleTestCase):
+
+    def test_fixed_deposit_compounds_quarterly_and_at_maturity(self):
+        self.assertEqual(accrual_rows(100000, 0, 600, 4), [
+            (1, 100000, 500, 100500),
+            (2, 0, 500, 101000),
+            (3, 0, 500, 101500),
+            # Interest on the compounded balance, rounded half up.
+            (4, 0, 508, 102008),
+        ])
+
+    def test_recurring_deposit_accrues_on_each_instalment(self):
+        self.assertEqual(accrual_rows(0, 10000, 600, 2), [
+            (1, 10000, 50, 10050),
+            (2, 10000, 100, 20150),
+        ])
+
+
+class FirstDueTests(SimpleTestCase):
+
+    def test_instalments_before_today_are_taken_as_settled(self):
+        self.assertEqual(
+            first_due(datetime.date(2026, 1, 15), datetime.date(2027, 1, 15), 12, datetime.date(2026, 10, 18)),
+            (10, datetime.date(2026, 11, 15))
+        )
+
+    def test_schedule_starting_today_is_due_today(self):
+        today = datetime.date(2026, 10, 18)
+        self.assertEqual(
+            first_due(today, datetime.date(2027, 1, 18), 3, today),
+            (0, today)
+        )
+
+    def test_fixed_deposit_started_in_the_past_waits_for_maturity(self):
+        self.assertEqual(
+            first_due(datetime.date(2026, 1, 15), datetime.date(2027, 1, 15), 1, datetime.date(2026, 10, 18)),
+            (1, datetime.date(2027, 1, 15))
+        )
+
+    def test_matured_deposit_has_nothing_due(self):
+        self.assertEqual(
+            first_due(datetime.date(2025, 1, 15), datetime.date(2026, 1, 15), 1, datetime.date(2026, 10, 18)),
+            (1, None)
+        )
+
+
+class ScheduleMixin(AccountsMixin):
+    """Creates an approved FD or RD with its schedule."""
+
+    def create_schedule(self, balance, start_date, recurring=True, amount='100.00', tenure=3):
+        account = self.create_account(7001, balance)
+        paise = to_paise(amount)
+        initial, monthly = (0, paise) if recurring else (paise, 0)
+        rows = accrual_rows(initial, monthly, 600, tenure)
+        fields = {
+            'user': account.user,
+            'amount': Decimal(amount) * (tenure if recurring else 1),
+            'tenure': tenure,
+            'interest_rate': Decimal('6.00'),
+            'status': 'Approved',
+        }
+        if recurring:
+            application = {'rd_application': RDApplication.objects.create(monthly_amount=Decimal(amount), **fields)}
+        else:
+            application = {'fd_application': FDApplication.objects.create(**fields)}
+        deposited = initial + monthly * tenure
+        schedule = DepositSchedule.objects.create(
+            start_date=start_date,
+            maturity_date=start_date + relativedelta(months=tenure),
+            deposited_paise=deposited,
+            interest_paise=rows[-1][3] - deposited,
+            maturity_paise=rows[-1][3],
+            rows=[
+                [month, (start_date + relativedelta(months=month)).isoformat(), paid_in, interest, balance]
+                for month, paid_in, interest, balance in rows
+            ],
+            next_due_date=start_date,
+            **application
+        )
+        return account, schedule
+
+
+class DepositPostingTests(ScheduleMixin, TestCase):
+
+    def setUp(self):
+        self.today = datetime.date(2026, 10, 18)
+
+    def post(self):
+        return post_deposit_chunk(due_schedules(self.today), self.today, 100)
+
+    def test_posts_the_instalment_due_today(self):
+        account, schedule = self.create_schedule('1000.00', self.today)
+
+        _, posted, unpaid = self.post()
+
+        self.assertEqual((posted, unpaid), (1, 0))
+        account.refresh_from_db()
+        schedule.refresh_from_db()
+        self.assertEqual(account.balance, Decimal('900.00'))
+        self.assertEqual(schedule.instalments_posted, 1)
+        self.assertEqual(schedule.next_due_date, datetime.date(2026, 11, 18))
+        row = Transaction.objects.get(account=account)
+        self.assertEqual((row.transaction_type, row.schedule_event), (WITHDRAWAL, 1))
+
+    def test_uncovered_instalment_stays_due(self):
+        account, schedule = self.create_schedule('50.00', self.today)
+
+        _, posted, unpaid = self.post()
+
+        self.assertEqual((posted, unpaid), (0, 1))
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.instalments_posted, 0)
+        self.assertEqual(schedule.next_due_date, self.today)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_late_instalment_moves_the_schedule_back(self):
+        # Instalment 1 was due on 15 January and only covered now; the
+        # overdue instalments and the maturity must not follow at once.
+        account, schedule = self.create_schedule('1000.00', datetime.date(2026, 1, 15))
+
+        _, posted, _ = self.post()
+
+        self.assertEqual(posted, 1)
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.start_date, self.today)
+        self.assertEqual(schedule.next_due_date, datetime.date(2026, 11, 18))
+        self.assertEqual(schedule.maturity_date, datetime.date(2027, 1, 18))
+        self.assertEqual(schedule.rows[-1][1], '2027-01-18')
+        self.assertFalse(Transaction.objects.filter(transaction_type=DEPOSIT).exists())
+        account.refresh_from_db()
+        self.assertEqual(account.balance, Decimal('900.00'))
+
+    def test_late_fixed_deposit_matures_a_full_tenure_after_it_is_paid(self):
+        account, schedule = self.create_schedule(
+            '5000.00', datetime.date(2026, 1, 15), recurring=False, amount='1000.00'
+        )
+
+        self.post()
+
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.next_due_date, datetime.date(2027, 1, 18))
+        self.assertEqual(schedule.maturity_date, datetime.date(2027, 1, 18))
+        self.assertEqual(
+            list(Transaction.objects.values_list('transaction_type', flat=True)), [WITHDRAWAL]
+        )
+
+    def test_credits_the_maturity_when_due(self):
+        account, schedule = self.create_schedule(
+            '0.00', datetime.date(2026, 7, 18), recurring=False, amount='1000.00'
+        )
+        DepositSchedule.objects.filter(pk=schedule.pk).update(
+            instalments_posted=1, next_due_date=self.today
+        )
+
+        self.post()
+
+        schedule.refresh_from_db()
+        account.refresh_from_db()
+        self.assertIsNone(schedule.next_due_date)
+        self.assertEqual(account.balance, from_paise(schedule.maturity_paise))
+
+
+class CancelScheduleTests(ScheduleMixin, TestCase):
+
+    def reject(self, schedule):
+        RDApplication.objects.filter(pk=schedule.rd_application_id).update(status='Rejected')
+        return cancel_schedules(RDApplication, [schedule.rd_application_id])
+
+    def test_posted_instalments_are_refunded(self):
+        today = timezone.localdate()
+        account, schedule = self.create_schedule('1000.00', today)
+        post_deposit_chunk(due_schedules(today), today, 100)
+
+        deleted, refunded = self.reject(schedule)
+
+        self.assertEqual((deleted, refunded), (1, 1))
+        account.refresh_from_db()
+        self.assertEqual(account.balance, Decimal('1000.00'))
+        refund = Transaction.objects.get(transaction_type=DEPOSIT)
+        self.assertEqual(refund.amount, Decimal('100.00'))
+        self.assertEqual(refund.balance_after_transaction, Decimal('1000.00'))
+        self.assertFalse(DepositSchedule.objects.exists())
+        # The instalment stays in the ledger.
+        self.assertTrue(Transaction.objects.filter(transaction_type=WITHDRAWAL).exists())
+
+    def test_unposted_schedule_is_deleted_without_refund(self):
+        account, schedule = self.create_schedule('1000.00', timezone.localdate())
+
+        self.assertEqual(self.reject(schedule), (1, 0))
+        self.assertFalse(DepositSchedule.objects.exists())
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_matured_schedule_is_kept(self):
+        account, schedule = self.create_schedule('1000.00', timezone.localdate())
+        DepositSchedule.objects.filter(pk=schedule.pk).update(instalments_posted=3, next_due_date=None)
+
+        self.assertEqual(self.reject(schedule), (0, 0))
+        self.assertTrue(DepositSchedule.objects.exists())
+
+    def test_reapproval_builds_a_new_schedule(self):
+        account, schedule = self.create_schedule('1000.00', timezone.localdate())
+        self.reject(schedule)
+        RDApplication.objects.update(status='Approved')
+
+        self.assertEqual(build_schedules(RDApplication), 1)
+        self.assertEqual(DepositSchedule.objects.get().rd_application_id, schedule.rd_application_id)
+
+
+class ProfilingMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        url = reverse('transactions:transaction_report')
+        self.request = RequestFactory().get(url)
+        self.request.resolver_match = resolve(url)
+        record = mock.patch('transactions.profiling.record')
+        self.record = record.start()
+        self.addCleanup(record.stop)
+
+    def test_sample_rate_is_read_per_request(self):
+        middleware = ProfilingMiddleware(lambda request: HttpResponse())
+
+        with self.settings(PROFILING_SAMPLE_RATE=0):
+            middleware(self.request)
+        self.record.assert_not_called()
+        with self.settings(PROFILING_SAMPLE_RATE=1):
+            middleware(self.request)
+        self.record.assert_called_once()
+        self.assertEqual(self.record.call_args.args[:2], ('view', 'transactions:transaction_report'))
+
+    async def test_async_requests_are_profiled(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        middleware = ProfilingMiddleware(get_response)
+        with self.settings(PROFILING_SAMPLE_RATE=1):
+            response = await middleware(self.request)
+
+        self.assertEqual(response.status_code, 200)
+        self.record.assert_called_once()
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_streaming_responses_are_not_recorded(self):
+        middleware = ProfilingMiddleware(lambda request: StreamingHttpResponse(iter(['data'])))
+
+        middleware(self.request)
+
+        self.record.assert_not_called()
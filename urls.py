@@ -5,7 +5,7 @@ from django.urls import path, include
  
 from . import views
 
-from .views import DepositMoneyView, PaymentView, TransferView, WithdrawMoneyView, TransactionRepostView, profile
+from .views import DepositMoneyView, PaymentView, TransferView, WithdrawMoneyView, TransactionExportView, TransactionRepostView, profile
 
 
 app_name = 'transactions'
@@ -14,11 +14,15 @@ app_name = 'transactions'
 urlpatterns = [
     path("deposit/", DepositMoneyView.as_view(), name="deposit_money"),
     path("report/", TransactionRepostView.as_view(), name="transaction_report"),
+    path("report/export/", TransactionExportView.as_view(), name="transaction_export"),
+    path("balance-history/", views.balance_history, name="balance_history"),
     path("withdraw/", WithdrawMoneyView.as_view(), name="withdraw_money"),
     path('profile/', views.profile, name='profile'),
     path('transact/', views.transact, name='transact'),
     path('transfer/', TransferView.as_view(), name='transfer_form'),
     path('payment/', PaymentView.as_view(), name='payment_form'),
+    path('batch-payment/', views.BatchPaymentView.as_view(), name='batch_payment_form'),
+    path('batch-payment/<int:batch_id>/', views.payment_batch_status, name='payment_batch_status'),
     path('apply-fd/', views.apply_fd, name='apply_fd'),
     path('apply-rd/', views.apply_rd, name='apply_rd'),
     path('application-success/', views.application_success, name='application_success'),
@@ -30,6 +34,11 @@ urlpatterns = [
     path('approve-rd/<int:application_id>/', views.approve_rd_application, name='approve_rd_application'),
     path('reject-rd/<int:application_id>/', views.reject_rd_application, name='reject_rd_application'),
     path('status/', views.check_status, name='check_status'),
+    path('notifications/', views.notification_feed, name='notification_feed'),
+    path('notifications/<int:notification_id>/read/', views.mark_notification_read, name='mark_notification_read'),
+    path('notifications/read-all/', views.mark_all_notifications_read, name='mark_all_notifications_read'),
+    path('events/', views.event_stream, name='event_stream'),
+    path('metrics/', views.profiling_metrics, name='profiling_metrics'),
     path('fd-application/delete/<int:application_id>/', views.delete_fd_application, name='delete_fd_application'),
     path('rd-application/delete/<int:application_id>/', views.delete_rd_application, name='delete_rd_application'),
 
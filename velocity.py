@@ -0,0 +1,199 @@
+import logging
+import time
+from decimal import Decimal
+
+import redis
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+from transactions.events import EVENTS_REDIS_URL
+from transactions.schedules import from_paise, to_paise
+
+logger = logging.getLogger(__name__)
+
+VELOCITY_REDIS_URL = getattr(settings, 'VELOCITY_REDIS_URL', EVENTS_REDIS_URL)
+OUTFLOW_BUCKET_SECONDS = 3600
+OUTFLOW_BUCKETS = 24
+
+# Sliding-window counter: the previous fixed window's count is weighted by
+# how much of it still overlaps the sliding window.
+RATE_LIMIT_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+if previous * (window - elapsed) / window + current >= limit then
+    return 0
+end
+redis.call('INCR', KEYS[1])
+redis.call('PEXPIRE', KEYS[1], window * 2)
+return 1
+"""
+
+# Takes back a counted request without creating or underflowing the key.
+RATE_REFUND_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') > 0 then
+    return redis.call('DECR', KEYS[1])
+end
+return 0
+"""
+
+# Rolling outflow in hourly buckets of a hash; at most OUTFLOW_BUCKETS + 1
+# fields are ever read. Returns {reserved, total including the reservation}.
+OUTFLOW_SCRIPT = """
+local bucket = tonumber(ARGV[1])
+local amount = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local buckets = tonumber(ARGV[4])
+local total = 0
+local fields = redis.call('HGETALL', KEYS[1])
+for i = 1, #fields, 2 do
+    if tonumber(fields[i]) <= bucket - buckets then
+        redis.call('HDEL', KEYS[1], fields[i])
+    else
+        total = total + tonumber(fields[i + 1])
+    end
+end
+if total + amount > limit then
+    return {0, total}
+end
+redis.call('HINCRBY', KEYS[1], bucket, amount)
+redis.call('EXPIRE', KEYS[1], (buckets + 1) * tonumber(ARGV[5]))
+return {1, total + amount}
+"""
+
+_client = None
+_scripts = {}
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(VELOCITY_REDIS_URL)
+        _scripts['rate_limit'] = _client.register_script(RATE_LIMIT_SCRIPT)
+        _scripts['rate_refund'] = _client.register_script(RATE_REFUND_SCRIPT)
+        _scripts['outflow'] = _client.register_script(OUTFLOW_SCRIPT)
+    return _client
+
+
+# The limits are read on every check, so tests and the load benchmark can
+# change them with override_settings.
+
+def rate_limit():
+    """``(requests, seconds)``: money-movement POSTs a user may make per
+    window."""
+    return (
+        getattr(settings, 'MONEY_MOVEMENT_RATE_LIMIT', 10),
+        getattr(settings, 'MONEY_MOVEMENT_RATE_WINDOW', 60),
+    )
+
+
+def daily_outflow_limit():
+    """Money an account may send out over any rolling 24 hours."""
+    return Decimal(getattr(settings, 'DAILY_OUTFLOW_LIMIT', '200000'))
+
+
+def outflow_key(account_id):
+    return f'velocity:outflow:{account_id}'
+
+
+def rate_keys(user_id, window):
+    return f'velocity:rate:{user_id}:{window}', f'velocity:rate:{user_id}:{window - 1}'
+
+
+def check_rate_limit(user_id):
+    """Count a money-movement request of ``user_id`` and raise
+    ``ValidationError`` once the user is over the limit.
+
+    Returns the counter the request was added to, for ``refund_rate_limit``;
+    ``None`` if Redis was unavailable. Like the event stream, the checks
+    fail open: a Redis outage is logged and lets the request through to the
+    balance checks.
+    """
+    limit, window_seconds = rate_limit()
+    now_ms = int(time.time() * 1000)
+    window_ms = window_seconds * 1000
+    window = now_ms // window_ms
+    keys = rate_keys(user_id, window)
+    try:
+        get_client()
+        allowed = _scripts['rate_limit'](
+            keys=keys,
+            args=[limit, window_ms, now_ms - window * window_ms],
+        )
+    except redis.RedisError:
+        logger.warning('Rate limit check for user %s skipped: Redis is unavailable', user_id)
+        return None
+    if not allowed:
+        raise ValidationError(
+            'Too many requests. Please wait a minute before trying again.',
+            code='rate_limited'
+        )
+    return keys[0]
+
+
+def refund_rate_limit(counter):
+    """Take back a request counted by ``check_rate_limit``."""
+    if counter is None:
+        return
+    try:
+        get_client()
+        _scripts['rate_refund'](keys=[counter])
+    except redis.RedisError:
+        logger.warning('Could not refund rate limit counter %s', counter)
+
+
+def reserve_outflow(account_id, amount):
+    """Add ``amount`` to the account's rolling 24-hour outflow, or raise
+    ``ValidationError`` if that would exceed ``daily_outflow_limit()``.
+
+    Returns a reservation for ``release_outflow`` in case the posting does
+    not go through; ``None`` if Redis was unavailable.
+    """
+    limit = daily_outflow_limit()
+    paise = to_paise(amount)
+    bucket = int(time.time()) // OUTFLOW_BUCKET_SECONDS
+    try:
+        get_client()
+        reserved, total = _scripts['outflow'](
+            keys=[outflow_key(account_id)],
+            args=[bucket, paise, to_paise(limit), OUTFLOW_BUCKETS, OUTFLOW_BUCKET_SECONDS],
+        )
+    except redis.RedisError:
+        logger.warning('Outflow check for account %s skipped: Redis is unavailable', account_id)
+        return None
+    if not reserved:
+        remaining = max(to_paise(limit) - total, 0)
+        raise ValidationError(
+            f'This exceeds your limit of Rs. {limit} in 24 hours. '
+            f'You can send at most Rs. {from_paise(remaining)} right now.',
+            code='outflow_limit'
+        )
+    return account_id, bucket, paise
+
+
+def release_outflow(reservation):
+    if reservation is None:
+        return
+    account_id, bucket, paise = reservation
+    try:
+        get_client().hincrby(outflow_key(account_id), bucket, -paise)
+    except redis.RedisError:
+        logger.warning('Could not release outflow reservation for account %s', account_id)
+
+
+def reset_velocity(accounts):
+    """Forget the rate-limit counters and rolling outflow of ``accounts``
+    and their owners."""
+    _, window_seconds = rate_limit()
+    window = int(time.time()) // window_seconds
+    keys = [outflow_key(account.pk) for account in accounts]
+    for account in accounts:
+        keys += rate_keys(account.user_id, window)
+    if not keys:
+        return
+    try:
+        get_client().delete(*keys)
+    except redis.RedisError:
+        logger.warning('Could not reset velocity counters: Redis is unavailable')
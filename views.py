@@ -1,22 +1,82 @@
-from dateutil.relativedelta import relativedelta
+import datetime
+import hashlib
+import hmac
+import json
+import time
+import uuid
+
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
 from django.contrib import messages
+from django.contrib.auth import get_user
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.conf import settings
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.urls import reverse, reverse_lazy
 from django.utils import timezone
-from django.views.generic import CreateView, ListView
+from django.views.decorators.http import require_POST
+from django.views.generic import CreateView, FormView, ListView, View
 ##
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, render
 ##
+from transactions.account_context import get_account
 from transactions.constants import DEPOSIT, TRANSFER, WITHDRAWAL, PAYMENT
 from transactions.forms import (
+    BatchPaymentForm,
     DepositForm,
     TransactionDateRangeForm,
     WithdrawForm, 
 )
 from .forms import FDApplicationForm, RDApplicationForm
-from transactions.models import Transaction, FDApplication, RDApplication
-from accounts.models import UserBankAccount
+from transactions.models import (
+    FDApplication,
+    IdempotencyKey,
+    Notification,
+    PaymentBatch,
+    RDApplication,
+    Transaction,
+)
+from transactions.events import EVENTS_REDIS_URL, user_channel
+from transactions.notifications import mark_read, unread_count
+from transactions.page_cache import cached_user_page
+from transactions.pagination import KeysetPage, paginate_keyset
+from transactions.profiling import metrics
+from transactions.resolver import account_stub
+from transactions.search import search_queryset, search_transactions
+from transactions.services import (
+    post_batch,
+    post_deposit,
+    post_payment,
+    post_transfer,
+    post_withdrawal,
+)
+from transactions.tasks import review_applications
+from transactions.velocity import (
+    check_rate_limit,
+    refund_rate_limit,
+    release_outflow,
+    reserve_outflow,
+)
+from transactions.reports import (
+    balance_on,
+    daily_balances,
+    export_csv,
+    export_jsonl,
+    filter_timestamps,
+    summarize,
+)
 
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
@@ -28,47 +88,285 @@ class TransactionRepostView(LoginRequiredMixin, ListView):
     template_name = 'transactions/transaction_report.html'
     model = Transaction
     form_data = {}
+    paginate_by = 50
+    search = ''
 
     def get(self, request, *args, **kwargs):
         form = TransactionDateRangeForm(request.GET or None)
+        if form.is_bound and not form.is_valid():
+            return daterange_error(form)
         if form.is_valid():
             self.form_data = form.cleaned_data
+        self.search = request.GET.get('q', '').strip()
 
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
         queryset = super().get_queryset().filter(
-            account=self.request.user.account
+            account=get_account(self.request)
         )
 
-        daterange = self.form_data.get("daterange")
+        return filter_timestamps(
+            queryset,
+            self.form_data.get('start'),
+            self.form_data.get('end'),
+        )
 
-        if daterange:
-            queryset = queryset.filter(timestamp__date__range=daterange)
+    def paginate_queryset(self, queryset, page_size):
+        if self.search:
+            return self.paginate_search(page_size)
 
-        return queryset.distinct()
+        page = paginate_keyset(
+            queryset, self.request.GET.get('cursor'), page_size
+        )
+        return None, page, page.object_list, page.has_next
+
+    def paginate_search(self, page_size):
+        # Ranked results are paged by number; the cursor carries it.
+        cursor = self.request.GET.get('cursor') or '1'
+        if not cursor.isdigit() or int(cursor) < 1:
+            raise Http404('Invalid cursor')
+        page_number = int(cursor)
+
+        rows, has_next = search_transactions(
+            get_account(self.request),
+            self.search,
+            self.form_data.get('start'),
+            self.form_data.get('end'),
+            page=page_number,
+            page_size=page_size,
+        )
+        page = KeysetPage(rows, str(page_number + 1) if has_next else None)
+        return None, page, rows, has_next
+
+    def get_totals_queryset(self, account):
+        # With a search, the totals cover the matching rows only.
+        if not self.search:
+            return self.object_list
+        return search_queryset(
+            account,
+            self.search,
+            self.form_data.get('start'),
+            self.form_data.get('end'),
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        account = get_account(self.request)
+        page = context['page_obj']
         context.update({
-            'account': self.request.user.account,
-            'form': TransactionDateRangeForm(self.request.GET or None)
+            'account': account,
+            'form': TransactionDateRangeForm(self.request.GET or None),
+            'next_cursor': page.next_cursor,
+            'search': self.search,
+            'page_totals': summarize(
+                self.object_list.filter(
+                    pk__in=[row.pk for row in page]
+                ),
+                account,
+            ),
+            'range_totals': summarize(self.get_totals_queryset(account), account),
         })
 
+        if self.form_data.get('start_date') or self.form_data.get('end_date'):
+            context['daily_balances'] = daily_balances(
+                account,
+                self.form_data['start_date'],
+                self.form_data['end_date'],
+            )
+
         return context
 
 
-class TransactionCreateMixin(LoginRequiredMixin, CreateView):
+def daterange_error(form):
+    return HttpResponseBadRequest(' '.join(
+        error for errors in form.errors.values() for error in errors
+    ))
+
+
+class TransactionExportView(LoginRequiredMixin, View):
+    """Stream the statement as CSV (default) or JSON lines (``?format=jsonl``)."""
+    formats = {
+        'csv': ('text/csv', 'csv', export_csv),
+        'jsonl': ('application/x-ndjson', 'jsonl', export_jsonl),
+    }
+
+    def get(self, request, *args, **kwargs):
+        export_format = self.formats.get(request.GET.get('format', 'csv'))
+        if export_format is None:
+            return HttpResponseBadRequest('Unsupported export format')
+        content_type, extension, export = export_format
+
+        form = TransactionDateRangeForm(request.GET)
+        if not form.is_valid():
+            return daterange_error(form)
+
+        account = get_account(request)
+        queryset = filter_timestamps(
+            Transaction.objects.filter(account=account),
+            form.cleaned_data['start'],
+            form.cleaned_data['end'],
+        )
+
+        response = StreamingHttpResponse(export(queryset), content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="statement-{account.account_no}.{extension}"'
+        )
+        return response
+
+
+BALANCE_HISTORY_DAYS = 90
+
+
+@login_required
+def balance_history(request):
+    """Daily closing balances for the selected range (default: last 90
+    days), read from the daily snapshots rather than the ledger."""
+    form = TransactionDateRangeForm(request.GET)
+    if not form.is_valid():
+        return daterange_error(form)
+
+    account = get_account(request)
+    end_date = form.cleaned_data['end_date'] or timezone.localdate()
+    start_date = (
+        form.cleaned_data['start_date']
+        or end_date - datetime.timedelta(days=BALANCE_HISTORY_DAYS)
+    )
+
+    snapshots = daily_balances(account, start_date, end_date)
+    return JsonResponse({
+        'account': account.account_no,
+        'opening_balance': str(
+            balance_on(account, start_date - datetime.timedelta(days=1))
+        ),
+        'days': [
+            {
+                'date': snapshot.date.isoformat(),
+                'closing_balance': str(snapshot.closing_balance),
+                'credits': str(snapshot.credits),
+                'debits': str(snapshot.debits),
+                'transaction_count': snapshot.transaction_count,
+            }
+            for snapshot in snapshots
+        ],
+    })
+
+
+def upload_digest(upload):
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    # Rewound so the form can still read the upload.
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+class IdempotentPostMixin:
+    """POST handling for views that move money: every request counts
+    against the user's rate limit, and a client-supplied idempotency key
+    makes retries safe.
+
+    A request whose key was already claimed is answered with the original
+    outcome before the form is validated; ``get_replay_url(claim)`` says
+    where that outcome is shown. Claiming the key is left to the posting.
+    """
+    rate_limit_counter = None
+
+    def get_idempotency_key(self):
+        return (
+            self.request.headers.get('Idempotency-Key')
+            or self.request.POST.get('idempotency_key', '')
+        ).strip()
+
+    def get_request_hash(self):
+        """Hash of the view and submitted fields and files, so a retry can be
+        told apart from a different request reusing the same key."""
+        fields = sorted(
+            (name, value)
+            for name, values in self.request.POST.lists()
+            if name not in ('csrfmiddlewaretoken', 'idempotency_key')
+            for value in values
+        )
+        files = sorted(
+            (name, upload_digest(upload))
+            for name, uploads in self.request.FILES.lists()
+            for upload in uploads
+        )
+        payload = json.dumps([self.request.path, fields, files])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get_claim(self, key):
+        return IdempotencyKey.objects.filter(user=self.request.user, key=key).first()
+
+    def get_replay_url(self, claim):
+        return self.get_success_url()
+
+    def reject(self, form, error, status):
+        form.add_error(None, error)
+        response = self.form_invalid(form)
+        response.status_code = status
+        return response
+
+    def replay(self, claim, form):
+        """Answer a request whose key was already claimed with the outcome
+        of the original request."""
+        if claim.request_hash and claim.request_hash != self.get_request_hash():
+            return self.reject(form, ValidationError(
+                'This request key was already used for a different request.',
+                code='idempotency_key_reused'
+            ), 422)
+        # A retry is not a new money movement, so it does not use up the
+        # user's rate limit.
+        refund_rate_limit(self.rate_limit_counter)
+        messages.info(self.request, 'This request was already processed.')
+        return HttpResponseRedirect(self.get_replay_url(claim))
+
+    def post(self, request, *args, **kwargs):
+        # Throttled before the form is validated, so invalid submissions
+        # count against the limit too.
+        try:
+            self.rate_limit_counter = check_rate_limit(request.user.pk)
+        except ValidationError as error:
+            return self.reject(self.get_form(), error, 429)
+
+        key = self.get_idempotency_key()
+        if len(key) > 64:
+            return self.reject(self.get_form(), ValidationError(
+                'Invalid request key.', code='invalid_idempotency_key'
+            ), 400)
+        # A retry of a committed request is answered before the form is
+        # validated against a balance the original request already moved.
+        if key:
+            claim = self.get_claim(key)
+            if claim is not None:
+                return self.replay(claim, self.get_form())
+        return super().post(request, *args, **kwargs)
+
+
+class TransactionCreateMixin(LoginRequiredMixin, IdempotentPostMixin, CreateView):
+    """Base view for money movements.
+
+    Subclasses implement ``post_transaction(form)``, which posts the movement
+    through ``transactions.services`` inside the view's transaction and
+    returns the ledger row written for the user's account, and set
+    ``success_message``, formatted with the form's cleaned data once the
+    transaction has committed.
+    """
     template_name = 'transactions/transaction_form.html'
     model = Transaction
     title = ''
     success_url = reverse_lazy('transactions:transaction_report')
+    # Whether the posting takes money out and counts towards the rolling
+    # daily outflow limit.
+    outflow = False
+    success_message = ''
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         kwargs.update({
-            'account': self.request.user.account
+            'account': get_account(self.request)
         })
+        kwargs['initial'].setdefault('idempotency_key', uuid.uuid4().hex)
         return kwargs
 
     def get_context_data(self, **kwargs):
@@ -79,46 +377,72 @@ class TransactionCreateMixin(LoginRequiredMixin, CreateView):
 
         return context
 
+    def post(self, request, *args, **kwargs):
+        self.object = None
+        return super().post(request, *args, **kwargs)
+
+    def form_valid(self, form):
+        key = self.get_idempotency_key()
+
+        # Balances are re-checked under row locks, so the post can still be
+        # rejected after the form validated against a stale balance. The
+        # idempotency key is claimed in the same transaction, so a rejected
+        # post releases it again, as it does the outflow reservation.
+        reservation = None
+        posted = False
+        try:
+            if self.outflow:
+                reservation = reserve_outflow(
+                    get_account(self.request).pk,
+                    form.cleaned_data['amount']
+                )
+            with transaction.atomic():
+                if key:
+                    # A concurrent retry that got past the lookup in
+                    # post() waits here for the first request's claim.
+                    claim, created = IdempotencyKey.objects.get_or_create(
+                        user=self.request.user,
+                        key=key,
+                        defaults={'request_hash': self.get_request_hash()}
+                    )
+                    if not created:
+                        return self.replay(claim, form)
+
+                self.object = self.post_transaction(form)
+
+                if key:
+                    claim.transaction_id = self.object.pk
+                    claim.save(update_fields=['transaction'])
+            posted = True
+        except ValidationError as error:
+            form.add_error(None, error)
+            return self.form_invalid(form)
+        finally:
+            if not posted:
+                release_outflow(reservation)
+
+        messages.success(self.request, self.success_message % form.cleaned_data)
+        return HttpResponseRedirect(self.get_success_url())
+
 
 class DepositMoneyView(TransactionCreateMixin):
     form_class = DepositForm
     title = 'Deposit Money to Your Account'
+    success_message = 'Rs.%(amount)s was deposited to your account successfully'
 
     def get_initial(self):
         initial = {'transaction_type': DEPOSIT}
         return initial
 
-    def form_valid(self, form):
+    def post_transaction(self, form):
         amount = form.cleaned_data.get('amount')
-        account = self.request.user.account
-
-        if not account.initial_deposit_date:
-            now = timezone.now()
-            next_interest_month = int(
-                12 / account.account_type.interest_calculation_per_year
-            )
-            account.initial_deposit_date = now
-            account.interest_start_date = (
-                now + relativedelta(
-                    months=+next_interest_month
-                )
-            )
-
-        account.balance += amount
-        account.save(
-            update_fields=[
-                'initial_deposit_date',
-                'balance',
-                'interest_start_date'
-            ]
+        ledger_row = post_deposit(
+            get_account(self.request),
+            amount,
+            description=form.cleaned_data.get('description', '')
         )
 
-        messages.success(
-            self.request,
-            f'Rs.{amount} was deposited to your account successfully'
-        )
-
-        return super().form_valid(form)
+        return ledger_row
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -128,24 +452,23 @@ class DepositMoneyView(TransactionCreateMixin):
 
 class WithdrawMoneyView(TransactionCreateMixin):
     form_class = WithdrawForm
+    outflow = True
     title = 'Withdraw Money from Your Account'
+    success_message = 'Successfully withdrawn Rs.%(amount)s from your account'
 
     def get_initial(self):
         initial = {'transaction_type': WITHDRAWAL}
         return initial
 
-    def form_valid(self, form):
+    def post_transaction(self, form):
         amount = form.cleaned_data.get('amount')
-
-        self.request.user.account.balance -= form.cleaned_data.get('amount')
-        self.request.user.account.save(update_fields=['balance'])
-
-        messages.success(
-            self.request,
-            f'Successfully withdrawn Rs.{amount} from your account'
+        ledger_row = post_withdrawal(
+            get_account(self.request),
+            amount,
+            description=form.cleaned_data.get('description', '')
         )
 
-        return super().form_valid(form)
+        return ledger_row
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -247,12 +570,15 @@ def profile(request):
 
 ##transact start
 @login_required
+@cached_user_page
 def transact(request):
         return render(request, 'transactions/transact.html')
 @login_required
+@cached_user_page
 def fd_rd(request):
         return render(request, 'transactions/fd_rd.html')
 @login_required
+@cached_user_page
 def check_status(request):
         return render(request, 'transactions/check_status.html')
 
@@ -320,52 +646,27 @@ from .forms import PaymentForm, TransferForm
 
 class PaymentView(TransactionCreateMixin):
     form_class = PaymentForm
+    outflow = True
     title = 'PAYMENT'
+    success_message = 'Successfully PAID Rs.%(amount)s to account number %(recipient_account)s'
 
     def get_initial(self):
         initial = {'transaction_type': PAYMENT}
         return initial
 
-    def form_valid(self, form):
+    def post_transaction(self, form):
         amount = form.cleaned_data.get('amount')
-        recipient_account_no = form.cleaned_data.get('recipient_account')
-
-        # Update the user's account balance
-        user_account = self.request.user.account
-        user_account.balance -= amount
-        user_account.save(update_fields=['balance'])
-
-        # # Create transaction for the user's account
-        # user_transaction = Transaction.objects.create(
-        #     account=user_account,
-        #     amount=amount,
-        #     transaction_type=PAYMENT,
-        #     description=form.cleaned_data.get('description'),
-        #     recipient_name=form.cleaned_data.get('recipient_name'),
-        #     recipient_account=recipient_account_no,
-        #     payment_method=form.cleaned_data.get('payment_method'),
-        #     balance_after_transaction=user_account.balance
-        # )
-
-        # Update recipient's account balance and create transaction if it exists
-        recipient_account = UserBankAccount.objects.get(account_no=recipient_account_no)
-        recipient_account.balance += amount
-        recipient_account.save(update_fields=['balance'])
-
-        recipient_transaction = Transaction.objects.create(
-            account=recipient_account,
-            amount=amount,
-            transaction_type=PAYMENT,
-            description=f'Received payment from {self.request.user.first_name}',
-            balance_after_transaction=recipient_account.balance
-        )
 
-        messages.success(
-            self.request,
-            f'Successfully PAID Rs.{amount} to account number {recipient_account_no}'
+        ledger_row = post_payment(
+            get_account(self.request),
+            account_stub(form.recipient),
+            amount,
+            recipient_name=form.cleaned_data.get('recipient_name'),
+            payment_method=form.cleaned_data.get('payment_method'),
+            description=form.cleaned_data.get('description')
         )
 
-        return super().form_valid(form)
+        return ledger_row
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -374,64 +675,233 @@ class PaymentView(TransactionCreateMixin):
     
 class TransferView(TransactionCreateMixin):
     form_class = TransferForm
+    outflow = True
     title = 'TRANSFER'
+    success_message = (
+        'Successfully TRANSFERRED Rs.%(amount)s from your account '
+        'to account %(destination_account)s'
+    )
 
     def get_initial(self):
         initial = {'transaction_type': TRANSFER}
         return initial
 
-    def form_valid(self, form):
+    def post_transaction(self, form):
         amount = form.cleaned_data.get('amount')
-        source_account = self.request.user.account
-        destination_account_number = form.cleaned_data.get('destination_account')
 
-        # Deduct amount from source account
-        source_account.balance -= amount
-        source_account.save(update_fields=['balance'])
+        # The form resolved the destination before any money moves.
+        ledger_row = post_transfer(
+            get_account(self.request),
+            account_stub(form.destination),
+            amount,
+            description=form.cleaned_data.get('description')
+        )
+        return ledger_row
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['form_type'] = 'transfer'
+        return context
+
+
+
+class BatchPaymentView(LoginRequiredMixin, IdempotentPostMixin, FormView):
+    template_name = 'transactions/batch_payment_form.html'
+    form_class = BatchPaymentForm
+    success_url = reverse_lazy('transactions:transaction_report')
 
-        # Add amount to destination account
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs.update({
+            'account': get_account(self.request)
+        })
+        kwargs['initial'].setdefault('idempotency_key', uuid.uuid4().hex)
+        return kwargs
+
+    def get_replay_url(self, claim):
+        if claim.batch_id is None:
+            return self.get_success_url()
+        return reverse('transactions:payment_batch_status', args=[claim.batch_id])
+
+    def form_valid(self, form):
+        key = self.get_idempotency_key()
+        account = get_account(self.request)
+        legs = form.cleaned_data['legs']
+        total = form.cleaned_data['total']
+
+        # The whole batch counts towards the daily outflow limit, reserved
+        # before posting and released again if the posting does not commit.
+        reservation = None
+        posted = False
         try:
-            destination_account = UserBankAccount.objects.get(account_no=destination_account_number)
-            destination_account.balance += amount
-            destination_account.save(update_fields=['balance'])
-        except UserBankAccount.DoesNotExist:
-            form.add_error('destination_account', 'Destination account does not exist.')
+            reservation = reserve_outflow(account.pk, total)
+            batch = PaymentBatch.objects.create(
+                account=account,
+                description=form.cleaned_data.get('description', ''),
+                item_count=len(legs),
+                total_amount=total
+            )
+            claim = None
+            if key:
+                claim = IdempotencyKey(
+                    user=self.request.user,
+                    key=key,
+                    request_hash=self.get_request_hash()
+                )
+            post_batch(batch, legs, claim=claim)
+            posted = True
+        except ValidationError as error:
+            form.add_error(None, error)
             return self.form_invalid(form)
-
-        # # Create a transaction record for the source account
-        # Transaction.objects.create(
-        #     account=source_account,
-        #     amount=amount,
-        #     balance_after_transaction=source_account.balance,
-        #     transaction_type=TRANSFER,
-        #     source_account=source_account.account_no,
-        #     destination_account=destination_account_number,
-        #     description=form.cleaned_data.get('description')
-        # )
-
-        # Create a transaction record for the destination account
-        Transaction.objects.create(
-            account=destination_account,
-            amount=amount,
-            balance_after_transaction=destination_account.balance,
-            transaction_type=TRANSFER,
-            source_account=source_account.account_no,
-            destination_account=destination_account_number,
-            description=form.cleaned_data.get('description')
-        )
+        except IntegrityError:
+            # A concurrent retry that got past the lookup in post() claimed
+            # the key first.
+            existing = self.get_claim(key) if key else None
+            if existing is None:
+                raise
+            return self.replay(existing, form)
+        finally:
+            if not posted:
+                release_outflow(reservation)
 
         messages.success(
             self.request,
-            f'Successfully TRANSFERRED Rs.{amount} from your account to account {destination_account_number}'
+            f'Batch {batch.pk}: successfully paid Rs.{total} to {len(legs)} accounts'
         )
         return super().form_valid(form)
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['form_type'] = 'transfer'
-        return context
 
 
+@login_required
+def payment_batch_status(request, batch_id):
+    batch = get_object_or_404(
+        PaymentBatch, id=batch_id, account=get_account(request)
+    )
+    return JsonResponse({
+        'id': batch.pk,
+        'status': batch.status,
+        'item_count': batch.item_count,
+        'total_amount': str(batch.total_amount),
+        'error': batch.error,
+        'created_at': batch.created_at.isoformat(),
+        'posted_at': batch.posted_at.isoformat() if batch.posted_at else None,
+    })
+
+
+NOTIFICATION_PAGE_SIZE = 20
+
+
+@login_required
+def notification_feed(request):
+    """Newest-first notifications, cursor paginated (``?cursor=``);
+    ``?unread=1`` limits the feed to unread ones."""
+    queryset = Notification.objects.filter(user=request.user)
+    if request.GET.get('unread'):
+        queryset = queryset.filter(is_read=False)
+
+    page = paginate_keyset(
+        queryset,
+        request.GET.get('cursor'),
+        NOTIFICATION_PAGE_SIZE,
+        field='created_at',
+        descending=True
+    )
+    return JsonResponse({
+        'results': [
+            {
+                'id': notification.pk,
+                'message': notification.message,
+                'created_at': notification.created_at.isoformat(),
+                'is_read': notification.is_read,
+            }
+            for notification in page
+        ],
+        'next_cursor': page.next_cursor,
+        'unread_count': unread_count(request.user),
+    })
+
+
+@login_required
+@require_POST
+def mark_notification_read(request, notification_id):
+    mark_read(request.user, [notification_id])
+    return JsonResponse({'unread_count': unread_count(request.user)})
+
+
+@login_required
+@require_POST
+def mark_all_notifications_read(request):
+    updated = mark_read(request.user)
+    return JsonResponse({'updated': updated, 'unread_count': 0})
+
+
+def profiling_metrics(request):
+    """Profiling totals of this process in the Prometheus text format.
+
+    Staff users may always read the metrics; scrapers authenticate with
+    ``Authorization: Bearer <PROFILING_METRICS_TOKEN>`` when it is set.
+    """
+    token = getattr(settings, 'PROFILING_METRICS_TOKEN', None)
+    authorized = request.user.is_staff or bool(token) and hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(),
+        f'Bearer {token}'.encode()
+    )
+    if not authorized:
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4')
+
+
+EVENT_STREAM_HEARTBEAT = 15  # seconds
+# Connections are closed after this long and the browser reconnects after
+# EVENT_STREAM_RETRY, so none outlives a deploy or a revoked session for long.
+EVENT_STREAM_MAX_AGE = getattr(settings, 'EVENT_STREAM_MAX_AGE', 30 * 60)  # seconds
+EVENT_STREAM_RETRY = 5000  # milliseconds
+
+
+async def event_stream(request):
+    """Server-sent events: balance changes, new notifications and FD/RD
+    application updates for the signed-in user.
+
+    Must be served by the ASGI application. Each connection holds one Redis
+    pub/sub subscription and no worker thread, and is closed after
+    ``EVENT_STREAM_MAX_AGE`` seconds; ``EventSource`` reconnects by itself
+    after the advertised retry delay, re-checking the session.
+    """
+    user = await sync_to_async(get_user)(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
+    async def events():
+        client = aioredis.Redis.from_url(EVENTS_REDIS_URL)
+        pubsub = client.pubsub()
+        deadline = time.monotonic() + EVENT_STREAM_MAX_AGE
+        try:
+            await pubsub.subscribe(user_channel(user.pk))
+            yield f'retry: {EVENT_STREAM_RETRY}\n\n'
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=min(EVENT_STREAM_HEARTBEAT, remaining)
+                )
+                if message is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                payload = json.loads(message['data'])
+                yield (
+                    f"event: {payload['event']}\n"
+                    f"data: {json.dumps(payload['data'])}\n\n"
+                )
+        finally:
+            await pubsub.reset()
+            await client.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 
 #FD and RD
 
@@ -462,16 +932,19 @@ def apply_rd(request):
     return render(request, 'transactions/apply_rd.html', {'form': form})
 
 @login_required
+@cached_user_page
 def user_fd_applications(request):
-    fd_applications = FDApplication.objects.filter(user=request.user)
+    fd_applications = FDApplication.objects.filter(user=request.user).select_related('schedule')
     return render(request, 'transactions/user_fd_applications.html', {'fd_applications': fd_applications})
 
 @login_required
+@cached_user_page
 def user_rd_applications(request):
-    rd_applications = RDApplication.objects.filter(user=request.user)
+    rd_applications = RDApplication.objects.filter(user=request.user).select_related('schedule')
     return render(request, 'transactions/user_rd_applications.html', {'rd_applications': rd_applications})
 
 @login_required
+@cached_user_page
 def application_success(request):
     return render(request, 'transactions/application_success.html')
 
@@ -480,8 +953,7 @@ def application_success(request):
 def approve_fd_application(request, application_id):
     if request.method == 'POST':
         application = get_object_or_404(FDApplication, id=application_id)
-        application.status = 'Approved'
-        application.save()
+        review_applications.delay('fd', [application.pk], 'Approved')
     return redirect('core:fd_rd_request')
 
 @login_required
@@ -489,8 +961,7 @@ def approve_fd_application(request, application_id):
 def reject_fd_application(request, application_id):
     if request.method == 'POST':
         application = get_object_or_404(FDApplication, id=application_id)
-        application.status = 'Rejected'
-        application.save()
+        review_applications.delay('fd', [application.pk], 'Rejected')
     return redirect('core:fd_rd_request')
 
 @login_required
@@ -498,8 +969,7 @@ def reject_fd_application(request, application_id):
 def approve_rd_application(request, application_id):
     if request.method == 'POST':
         application = get_object_or_404(RDApplication, id=application_id)
-        application.status = 'Approved'
-        application.save()
+        review_applications.delay('rd', [application.pk], 'Approved')
     return redirect('core:fd_rd_request')
 
 @login_required
@@ -507,8 +977,7 @@ def approve_rd_application(request, application_id):
 def reject_rd_application(request, application_id):
     if request.method == 'POST':
         application = get_object_or_404(RDApplication, id=application_id)
-        application.status = 'Rejected'
-        application.save()
+        review_applications.delay('rd', [application.pk], 'Rejected')
     return redirect('core:fd_rd_request')
 
 